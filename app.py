@@ -1,18 +1,26 @@
 import os
-import json
 import time
 import logging
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter, Retry
 
 # ====== 設定 ======
+# 接続を使い回す共有セッション（LINE APIへのTLSハンドシェイクを1回に）
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10, pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.5,
+                      status_forcelist=[429, 500, 502, 503, 504]),
+))
+
 LINE_ACCESS_TOKEN = os.getenv("LINE_ACCESS_TOKEN", "").strip()
 LINE_USER_ID      = os.getenv("LINE_USER_ID", "").strip()
 
-# 通知済みレースの記録（重複通知防止）
-NOTIFIED_PATH = Path("/tmp/notified_races.json")
+# 通知済みレースの記録（重複通知防止、追記専用: "key\tエポック秒" を1行ずつ）
+NOTIFIED_PATH = Path("/tmp/notified_races.log")
 
 logging.basicConfig(
     level=logging.INFO,
@@ -34,7 +42,7 @@ def send_line_message(text: str) -> None:
         "messages": [{"type": "text", "text": text}],
     }
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=10)
+        r = SESSION.post(url, headers=headers, json=payload, timeout=10)
         if r.status_code != 200:
             logging.warning("LINE送信失敗 status=%s body=%s", r.status_code, r.text)
         else:
@@ -42,17 +50,30 @@ def send_line_message(text: str) -> None:
     except Exception as e:
         logging.exception("LINE送信で例外: %s", e)
 
-def _load_notified() -> Dict[str, Any]:
-    if NOTIFIED_PATH.exists():
-        try:
-            return json.loads(NOTIFIED_PATH.read_text())
-        except Exception:
-            return {}
-    return {}
-
-def _save_notified(obj: Dict[str, Any]) -> None:
+def _load_notified() -> Dict[str, int]:
+    if not NOTIFIED_PATH.exists():
+        return {}
+    out: Dict[str, int] = {}
+    try:
+        for ln in NOTIFIED_PATH.read_text().splitlines():
+            if "\t" not in ln:
+                continue
+            key, ts = ln.split("\t", 1)
+            try:
+                out[key] = int(float(ts))
+            except ValueError:
+                continue
+    except Exception:
+        return {}
+    return out
+
+def _append_notified(entries: List[Tuple[str, int]]) -> None:
+    """全体の書き直しではなく追記のみ。1ジョブ分をまとめて1回のopen/writeで書く"""
+    if not entries:
+        return
     try:
-        NOTIFIED_PATH.write_text(json.dumps(obj, ensure_ascii=False))
+        with NOTIFIED_PATH.open("a") as f:
+            f.writelines(f"{key}\t{ts}\n" for key, ts in entries)
     except Exception as e:
         logging.warning("通知済み保存に失敗: %s", e)
 
@@ -89,6 +110,7 @@ def main():
         logging.info("戦略一致なし（通知なし）")
         return
 
+    appended: List[Tuple[str, int]] = []
     for h in hits:
         key = f"{h.get('race_id','')}_{h.get('strategy','')}"
         if notified.get(key):
@@ -101,9 +123,11 @@ def main():
             continue
 
         send_line_message(msg)
-        notified[key] = int(time.time())
+        ts = int(time.time())
+        notified[key] = ts
+        appended.append((key, ts))
 
-    _save_notified(notified)
+    _append_notified(appended)
     logging.info("ジョブ終了")
 
 if __name__ == "__main__":
@@ -11,9 +11,9 @@ from __future__ import annotations
 import os
 import json
 from datetime import datetime, timedelta
-import pytz
 
 from utils_summary import (
+    JST,
     jst_today_str, jst_yesterday_str, jst_now,
     read_notify_logs_for_day, try_acquire_daily_lock,
     load_user_ids, fetch_results_with_retry,
@@ -22,9 +22,6 @@ from utils_summary import (
 from line_api import send_multicast
 
 
-JST = pytz.timezone('Asia/Tokyo')
-
-
 def _send_empty_summary():
     msg = (
         "本日の該当レースはありませんでした。\n"
@@ -89,6 +86,3 @@ def run_yesterday_catchup():
 
     send_multicast(messages, uids)
     print(f"[CATCHUP] sent messages={len(messages)}")
-"""
-
-
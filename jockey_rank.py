@@ -6,6 +6,8 @@
 - C: その他（未掲載）
 """
 
+from functools import lru_cache
+
 # 文字のゆらぎを少し吸収（全角ドット等）
 def _norm(name: str) -> str:
     if not name:
@@ -55,6 +57,7 @@ ALIASES = {
     "Ｒ．クアトロ": "R.クアトロ",
 }
 
+@lru_cache(maxsize=4096)
 def jockey_rank(name: str) -> str:
     """
     騎手名から A/B/C を返す
@@ -6,10 +6,26 @@
 既存の送信ユーティリティがある場合は差し替えてください。
 """
 import os
+import json
 import requests
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson  # あれば使う（150件チャンク×メッセージ数ぶんのエンコードが軽くなる）
+except ImportError:
+    orjson = None
+from requests.adapters import HTTPAdapter, Retry
 
 LINE_TOKEN = os.getenv('LINE_CHANNEL_ACCESS_TOKEN') or os.getenv('LINE_ACCESS_TOKEN')
 
+# チャンク送信でTLS接続を使い回すための共有セッション
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=10, pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.5,
+                      status_forcelist=[429, 500, 502, 503, 504]),
+))
+
 
 def send_multicast(messages, user_ids):
     if not LINE_TOKEN:
@@ -19,22 +35,41 @@ def send_multicast(messages, user_ids):
         print('[LINE] user_ids empty')
         return
 
-    # LINE の上限安全策として 150 件で分割
+    # LINE の上限安全策として 宛先150件・メッセージ5通 で分割
     chunk = 150
+    msg_chunk = 5  # multicast 1回あたりの messages 上限
     url = 'https://api.line.me/v2/bot/message/multicast'
     headers = {
         'Authorization': f'Bearer {LINE_TOKEN}',
         'Content-Type': 'application/json'
         }
+
+    # チャンクは互いに独立なI/OなのでPOSTを並行化（直列だと宛先数/150 × RTT）
+    payloads = []
     for i in range(0, len(user_ids), chunk):
         to = user_ids[i:i+chunk]
-        payload = {
-            'to': to,
-            'messages': [{ 'type': 'text', 'text': m[:5000] }]  # 文字数上限対策
-        }
-        r = requests.post(url, headers=headers, json=payload, timeout=15)
-        try:
-            r.raise_for_status()
-            print(f'[LINE] multicast ok to={len(to)}')
-        except Exception as e:
-            print('[LINE] multicast error', e, r.text)
\ No newline at end of file
+        for j in range(0, len(messages), msg_chunk):
+            payloads.append({
+                'to': to,
+                'messages': [{ 'type': 'text', 'text': m[:5000] }  # 文字数上限対策
+                             for m in messages[j:j+msg_chunk]]
+            })
+
+    def _post(payload):
+        body = orjson.dumps(payload) if orjson else json.dumps(payload).encode('utf-8')
+        r = SESSION.post(url, headers=headers, data=body, timeout=15)
+        r.raise_for_status()
+        return len(payload['to'])
+
+    ok = 0
+    fails = []
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        futures = [ex.submit(_post, p) for p in payloads]
+        for f in futures:
+            try:
+                ok += f.result()
+            except Exception as e:
+                fails.append(str(e))
+    print(f'[LINE] multicast done chunks={len(payloads)} ok_targets={ok} fails={len(fails)}')
+    if fails:
+        print('[LINE] multicast errors', fails[:5])
\ No newline at end of file
@@ -4,15 +4,31 @@ import re
 import time
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable, Tuple, Dict, Any, List
 
 import requests
+from requests.adapters import HTTPAdapter, Retry
+
+try:
+    import orjson  # あれば使う（bytes直返しでencode工程も省ける）
+except ImportError:
+    orjson = None
 
 LINE_PUSH_URL = "https://api.line.me/v2/bot/message/push"
 LINE_ACCESS_TOKEN = os.getenv("LINE_ACCESS_TOKEN", "").strip()
 
+# 宛先ループ全体でTLS接続を使い回す（ユーザ毎のハンドシェイクを排除）
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10, pool_maxsize=10,
+    max_retries=Retry(total=0),  # リトライは_send_with_retryが判断（429の扱いが異なるため）
+))
+
 # ---- サニタイズ -------------------------------------------------------------
 _TAG_RE = re.compile(r"<[^>]+>")  # 簡易にHTMLタグを除去
+_WS_RE  = re.compile(r"[ \t]{2,}")   # 連続空白の圧縮（毎送信で呼ばれるため事前コンパイル）
 
 def _sanitize_text(text: str, max_len: int = 4900) -> str:
     """
@@ -28,7 +44,7 @@ def _sanitize_text(text: str, max_len: int = 4900) -> str:
     # HTMLタグ除去（<a href=...> などを殺す）
     t = _TAG_RE.sub("", t)
     # 余計な連続空白の整理（見た目を整える）
-    t = re.sub(r"[ \t]{2,}", " ", t)
+    t = _WS_RE.sub(" ", t)
     # 先頭末尾の空白
     t = t.strip()
     # 長さ制限（安全マージン）
@@ -36,6 +52,25 @@ def _sanitize_text(text: str, max_len: int = 4900) -> str:
         t = t[:max_len] + " …"
     return t
 
+# ---- レート制御 --------------------------------------------------------------
+class _RateLimiter:
+    """最小送信間隔だけを保証するトークンバケット簡易版。
+    固定sleepと違い、送信自体に時間がかかった分は待たない。"""
+    def __init__(self, rps: float):
+        self._min = 1.0 / rps
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._min
+        if delay > 0:
+            time.sleep(delay)
+
+_SEND_LIMITER = _RateLimiter(rps=5.0)  # 旧: 一律0.2秒sleep
+
 # ---- 送信本体 ----------------------------------------------------------------
 def _build_headers() -> Dict[str, str]:
     if not LINE_ACCESS_TOKEN:
@@ -53,9 +88,10 @@ def _push_once(user_id: str, text: str) -> Tuple[bool, str]:
         "to": user_id,
         "messages": [{"type": "text", "text": text}],
     }
+    body = orjson.dumps(payload) if orjson else json.dumps(payload).encode("utf-8")
     try:
-        r = requests.post(LINE_PUSH_URL, headers=_build_headers(),
-                          data=json.dumps(payload), timeout=10)
+        r = SESSION.post(LINE_PUSH_URL, headers=_build_headers(),
+                         data=body, timeout=10)
         if r.status_code == 200:
             return True, "ok"
         return False, f"{r.status_code} {r.text}"
@@ -99,15 +135,18 @@ def send_line(recipients: Any, text: str) -> Dict[str, Any]:
     safe_text = _sanitize_text(text)
     result = {"ok": 0, "ng": 0, "fails": []}
 
-    # 軽いスロットリング：送信間隔 0.2s（レート制限回避のため）
-    for uid in targets:
-        ok, reason = _send_with_retry(uid, safe_text)
-        if ok:
-            result["ok"] += 1
-        else:
-            result["ng"] += 1
-            result["fails"].append({"user_id": uid, "reason": reason})
-        time.sleep(0.2)
+    # 送信は宛先ごとに独立なので並行化。レートはトークンバケットが横断的に5/sへ律速する
+    def _send(uid: str):
+        _SEND_LIMITER.wait()
+        return uid, _send_with_retry(uid, safe_text)
+
+    with ThreadPoolExecutor(max_workers=min(4, len(targets))) as ex:
+        for uid, (ok, reason) in ex.map(_send, targets):
+            if ok:
+                result["ok"] += 1
+            else:
+                result["ng"] += 1
+                result["fails"].append({"user_id": uid, "reason": reason})
 
     # 失敗がある場合はログに残す
     if result["ng"]:
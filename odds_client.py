@@ -1,6 +1,9 @@
 # odds_client.py  v2.3  — 今日のRACEIDを堅牢に収集する版
 import re
+import json
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import List, Set, Tuple
 import requests
 from urllib.parse import urljoin
@@ -21,17 +24,47 @@ RE_ODDS_TANFUKU = re.compile(r"/odds/tanfuku/RACEID/(\d{18})")
 RE_RACECARD_LIST = re.compile(r"/race_card/list/RACEID/(\d{18})")
 
 
-def _fetch(url: str) -> Tuple[int, str]:
-    """GETして(status_code, text)を返す。軽いリトライ付き"""
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": UA_PC, "Accept-Language": "ja,en;q=0.8",
+                        "Accept-Encoding": "gzip, deflate, br"})
+# ワーカー数（ThreadPoolExecutor=4）に対してプールを余裕をもって確保し、全接続をkeep-alive
+SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=8))
+
+# トップ/一覧ページ用の条件付きGETキャッシュ（cron再実行をまたいで304で済ませる）
+_ETAG_CACHE_PATH = Path("/tmp/odds_etag_cache.json")
+try:
+    _ETAG_CACHE = json.loads(_ETAG_CACHE_PATH.read_text()) if _ETAG_CACHE_PATH.exists() else {}
+except Exception:
+    _ETAG_CACHE = {}
+
+def _save_etag_cache():
+    try:
+        tmp = _ETAG_CACHE_PATH.with_suffix(".tmp")
+        tmp.write_text(json.dumps(_ETAG_CACHE, ensure_ascii=False, separators=(",", ":")))
+        tmp.replace(_ETAG_CACHE_PATH)
+    except Exception:
+        pass
+
+
+def _fetch(url: str, use_cache: bool = False) -> Tuple[int, str]:
+    """GETして(status_code, text)を返す。軽いリトライ付き（接続は共有セッションで再利用）"""
     last_err = None
     for i in range(RETRY):
         try:
-            r = requests.get(
-                url,
-                headers={"User-Agent": UA_PC, "Accept-Language": "ja,en;q=0.8"},
-                timeout=DEFAULT_TIMEOUT,
-            )
+            headers = {}
+            cond = _ETAG_CACHE.get(url) if use_cache else None
+            if cond:
+                if cond.get("etag"): headers["If-None-Match"] = cond["etag"]
+                if cond.get("lm"):   headers["If-Modified-Since"] = cond["lm"]
+            r = SESSION.get(url, timeout=DEFAULT_TIMEOUT, headers=headers or None)
+            if use_cache and r.status_code == 304 and cond:
+                return 200, cond.get("body", "")
             if r.status_code == 200 and r.text:
+                if use_cache and (r.headers.get("ETag") or r.headers.get("Last-Modified")):
+                    _ETAG_CACHE[url] = {"etag": r.headers.get("ETag", ""),
+                                        "lm": r.headers.get("Last-Modified", ""),
+                                        "body": r.text}
+                    _save_etag_cache()
                 return r.status_code, r.text
             last_err = f"HTTP {r.status_code}"
         except requests.RequestException as e:
@@ -90,41 +123,40 @@ def list_today_raceids() -> List[str]:
     各場のレース一覧ページ→単勝/複勝オッズのRACEIDを列挙して返す。
     """
     # 1) トップページ
-    _, top_html = _fetch(BASE)
+    _, top_html = _fetch(BASE, use_cache=True)
 
+    # （#todaysTicket優先→全ページ走査のフォールバックは関数内で実施済み）
     base_ids = _extract_racecard_base_ids_from_top(top_html)
 
-    # フォールバック：何も拾えない時は全ページからrace_card/listのRACEIDを総なめ
-    if not base_ids:
-        base_ids = _extract_racecard_base_ids_from_top(top_html)
-
+    # 2) 各場のレース一覧ページ → 3) オッズRACEIDのヘルスチェック を並行化。
+    #    直列＋スリープだと 場数×レース数×(RTT+ウェイト) かかっていた。
+    #    ワーカー数を絞ること自体が負荷制御になるので明示スリープは置かない。
     raceids: Set[str] = set()
-    for base_id in sorted(base_ids):
-        # レース一覧（出馬表）ページ
+
+    def _expand(base_id: str) -> Set[str]:
         list_url = urljoin(BASE, f"race_card/list/RACEID/{base_id}")
         try:
-            _, list_html = _fetch(list_url)
+            _, list_html = _fetch(list_url, use_cache=True)
+        except Exception:
+            return set()
+        return _extract_today_odds_ids_from_racecard(list_html)
+
+    def _check(rid: str):
+        odds_url = urljoin(BASE, f"odds/tanfuku/RACEID/{rid}")
+        try:
+            status, _ = _fetch(odds_url)
+            return rid if status == 200 else None
         except Exception:
-            time.sleep(SLEEP_BETWEEN)
-            continue
-
-        # 2) レース一覧ページから当日のオッズRACEIDを収集
-        cand_ids = _extract_today_odds_ids_from_racecard(list_html)
-
-        # 3) 収集したオッズRACEIDの存在を軽くヘルスチェック（HEAD代わりにGET 1回だけ）
-        for rid in sorted(cand_ids):
-            odds_url = urljoin(BASE, f"odds/tanfuku/RACEID/{rid}")
-            try:
-                status, _ = _fetch(odds_url)
-                if status == 200:
-                    raceids.add(rid)
-                    # サーバーへの負荷を下げる
-                    time.sleep(SLEEP_BETWEEN)
-            except Exception:
-                # 存在しない組はスキップ
-                time.sleep(0.15)
-
-        time.sleep(SLEEP_BETWEEN)
+            # 存在しない組はスキップ
+            return None
+
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        cand_ids: Set[str] = set()
+        for ids in ex.map(_expand, sorted(base_ids)):
+            cand_ids |= ids
+        for rid in ex.map(_check, sorted(cand_ids)):
+            if rid:
+                raceids.add(rid)
 
     # 末尾重複もあり得るので数字順に
     return sorted(raceids)
@@ -13,9 +13,10 @@
 """
 
 import os, re, json, time, logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 import requests
-from bs4 import BeautifulSoup
+from lxml import html as lhtml
 
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
@@ -24,7 +25,8 @@ JST_OFFSET = 9*3600
 SESSION = requests.Session()
 SESSION.headers.update({
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36",
-    "Accept-Language": "ja,en-US;q=0.9,en;q=0.8"
+    "Accept-Language": "ja,en-US;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate, br"
 })
 TIMEOUT=(10,25)
 
@@ -34,13 +36,25 @@ NOTIFIED_LOG_SHEET=os.getenv("NOTIFIED_LOG_SHEET","notified_log")
 RESULTS_LOG_SHEET=os.getenv("RESULTS_LOG_SHEET","results_log")
 RESULT_DELAY_MIN=int(os.getenv("RESULT_DELAY_MIN","5"))
 BET_UNIT_YEN=int(os.getenv("BET_UNIT_YEN","100"))
+FETCH_WORKERS=int(os.getenv("FETCH_WORKERS","6"))
 
 RACEID_RE=re.compile(r"/RACEID/(\d{18})")
+from lxml import etree
+_SANRENTAN_XPATH=etree.XPath('//*[contains(text(), "三連単")]')
+_SANRENTAN_YEN_RE=re.compile(r"三連単[^0-9]*([0-9,]+)円")
+_YEN_NUM_RE=re.compile(r"([0-9,]+)")
+_FIN_HEAD_RE=re.compile(r"(着順|順位)")
+_SMALL_NUM_RE=re.compile(r"\b(\d{1,2})\b")
+
+_SVC=None  # 資格情報のJSONパース＋discovery構築はプロセスで1回
 
 def _svc():
-    info=json.loads(GOOGLE_CREDENTIALS_JSON)
-    creds=Credentials.from_service_account_info(info, scopes=["https://www.googleapis.com/auth/spreadsheets"])
-    return build("sheets","v4",credentials=creds, cache_discovery=False)
+    global _SVC
+    if _SVC is None:
+        info=json.loads(GOOGLE_CREDENTIALS_JSON)
+        creds=Credentials.from_service_account_info(info, scopes=["https://www.googleapis.com/auth/spreadsheets"])
+        _SVC=build("sheets","v4",credentials=creds, cache_discovery=False)
+    return _SVC
 
 def _fetch(url:str)->str:
     r=SESSION.get(url, timeout=TIMEOUT); r.raise_for_status(); r.encoding="utf-8"; return r.text
@@ -97,47 +111,39 @@ def _parse_finish_and_trifecta(rid:str)->Optional[Tuple[str,int]]:
     ]
     for url in urls:
         try:
-            html=_fetch(url)
-            soup=BeautifulSoup(html,"lxml")
-            # 1) 三連単配当
+            root=lhtml.fromstring(_fetch(url))
+            # 1) 三連単配当 — 「三連単」を含む要素だけをXPathでC側に選ばせ、
+            #    同一ブロック内の金額 → 後続セルの金額 の順で解決する
             trifecta=0
-            payoff = soup.find(text=re.compile("三連単"))
-            if payoff:
-                # 近傍から金額を拾う
-                block = payoff.parent if hasattr(payoff,"parent") else soup
-                txt = block.get_text(" ", strip=True)
-                m = re.search(r"三連単[^0-9]*([0-9,]+)円", txt)
-                if not m:
-                    # 払戻テーブルの別セル
-                    for td in soup.find_all(["td","th"]):
-                        t=td.get_text(" ",strip=True)
-                        if "三連単" in t:
-                            sibl=td.find_next("td")
-                            if sibl:
-                                mm=re.search(r"([0-9,]+)", sibl.get_text(" ",strip=True))
-                                if mm: trifecta=int(mm.group(1).replace(",",""))
-                else:
+            for el in _SANRENTAN_XPATH(root):
+                txt=" ".join(el.itertext()).strip()
+                m=_SANRENTAN_YEN_RE.search(txt)
+                if m:
                     trifecta=int(m.group(1).replace(",",""))
+                    break
+                # 払戻テーブルでラベルと金額がセル分割されている場合
+                if el.tag in ("td","th"):
+                    nxt=el.xpath("following::td[1]")
+                    if nxt:
+                        mm=_YEN_NUM_RE.search(" ".join(nxt[0].itertext()))
+                        if mm:
+                            trifecta=int(mm.group(1).replace(",",""))
+                            break
             # 2) 着順（上位3頭の馬番）
-            # 共通：順位/着順列があるtableを探す
+            # 共通：順位/着順列があるtableを探す（thead持ちのみ対象）
             finish=[]
-            for table in soup.find_all("table"):
-                head = table.find("thead")
-                if not head: continue
-                htxt = " ".join(head.stripped_strings)
-                if not re.search(r"(着順|順位)", htxt): continue
-                body=table.find("tbody") or table
-                for tr in body.find_all("tr")[:3]:
-                    tds=tr.find_all(["td","th"])
-                    txts=[" ".join(td.stripped_strings) for td in tds]
-                    # 馬番を含みそうなセルを探す
+            for head in root.xpath("//table/thead"):
+                if not _FIN_HEAD_RE.search(" ".join(head.itertext())): continue
+                table=head.getparent()
+                rows=table.xpath("./tbody/tr") or table.xpath("./tr[not(parent::thead)]")
+                for tr in rows[:3]:
+                    # 行テキストを1回だけ組み立て、数値候補をまとめて走査
+                    row_txt=" ".join(t.strip() for t in tr.itertext() if t.strip())
                     bn=None
-                    for s in txts:
-                        m=re.search(r"\b(\d{1,2})\b", s)
-                        if m:
-                            num=int(m.group(1))
-                            # 着順っぽい列は最初に来るので馬番の値としては 1~18 程度
-                            if 1<=num<=18: bn=num; break
+                    for m in _SMALL_NUM_RE.finditer(row_txt):
+                        num=int(m.group(1))
+                        # 着順っぽい列は最初に来るので馬番の値としては 1~18 程度
+                        if 1<=num<=18: bn=num; break
                     if bn is not None: finish.append(bn)
                 if len(finish)>=3: break
             if len(finish)>=3:
@@ -152,13 +158,16 @@ def main():
     rows=_read_notified_rows()
     done=_already_done_rids()
     now=time.time()
-    for r in rows:
-        rid=r["rid"]; sent=r["sent"]; tuma=r["tickets_uma"]
-        if not tuma: continue
-        if rid in done: continue
-        if (now - sent) < RESULT_DELAY_MIN*60:
-            continue
-        got=_parse_finish_and_trifecta(rid)
+    # 対象を絞ってから、レースごとに独立な結果ページ取得（最大3 URL/レース）を並行化
+    pending=[r for r in rows
+             if r["tickets_uma"] and r["rid"] not in done
+             and (now - r["sent"]) >= RESULT_DELAY_MIN*60]
+    if not pending:
+        logging.info("[WORKER] 対象なし"); return
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(pending))) as ex:
+        results=list(ex.map(lambda r: _parse_finish_and_trifecta(r["rid"]), pending))
+    for r, got in zip(pending, results):
+        rid=r["rid"]; tuma=r["tickets_uma"]
         if not got:
             logging.info("[SKIP] 結果未取得 rid=%s", rid); continue
         fin, payout = got
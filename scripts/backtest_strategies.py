@@ -30,12 +30,20 @@ from dataclasses import dataclass
 from typing import List, Dict, Any, Optional, Tuple
 
 import requests
-from bs4 import BeautifulSoup
+import lxml.html as LH
+
+try:
+    from selectolax.lexbor import LexborHTMLParser  # あればC実装の軽量DOMで走査
+except ImportError:
+    LexborHTMLParser = None
 
 # ---------------------------
 # 設定
 # ---------------------------
-HEADERS = {"user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+HEADERS = {
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+    "accept-encoding": "br, gzip, deflate",  # Rakutenは5〜10倍縮む
+}
 REQ_TIMEOUT = 12
 SLEEP_BASE = 0.6        # サイト負荷を避けるためのウェイト秒（±ランダム）
 MAX_RACES = 5000        # 読みすぎ防止の上限
@@ -50,6 +58,18 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(message)s"
 )
 
+# ---------------------------
+# 数値セル判定（ホットループ用）
+# ---------------------------
+def _is_num(s: str) -> bool:
+    """\d+(\.\d+)? 相当。1〜4文字の入力ではre.fullmatchの呼び出しコストの方が高い。"""
+    if not s:
+        return False
+    head, dot, tail = s.partition(".")
+    if not head.isdigit():
+        return False
+    return not dot or tail.isdigit()
+
 # ---------------------------
 # 便利構造体
 # ---------------------------
@@ -73,51 +93,62 @@ class RaceOdds:
 def http_get(url: str) -> str:
     r = requests.get(url, headers=HEADERS, timeout=REQ_TIMEOUT)
     r.raise_for_status()
-    r.encoding = r.apparent_encoding or "utf-8"
+    # apparent_encoding はchardetの全文走査で1ページ数十msかかる。Rakuten競馬はUTF-8固定
+    r.encoding = "utf-8"
     return r.text
 
 
 # ---------------------------
 # 単勝テーブル抽出（堅牢版）
 # ---------------------------
-def parse_tanfuku_table(html: str) -> List[HorseOdds]:
-    soup = BeautifulSoup(html, "html.parser")
-    # “単勝” の文字が含まれる table を優先
-    tables = soup.find_all("table")
-    candidates = []
-    for t in tables:
-        txt = t.get_text(" ", strip=True) or ""
-        if "単勝" in txt:
-            candidates.append(t)
-    if not candidates:
-        candidates = tables  # 保険
-
-    found: Dict[int, float] = {}
+def _iter_candidate_rows(html: str):
+    """“単勝”を含むtableを優先し、各行のセル文字列リストをyieldする。
+    selectolax があればそちらで走査（タグごとのPythonオブジェクト生成が無い分速い）。"""
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(html)
+        tables = tree.css("table")
+        candidates = [t for t in tables if "単勝" in t.text()] or tables
+        for t in candidates:
+            for tr in t.css("tr"):
+                yield [c.text(strip=True) for c in tr.css("td, th")]
+        return
+    # selectolaxが無ければlxml.htmlを直接使う（BS4ラッパを介さずC走査）
+    root = LH.fromstring(html)
+    tables = root.findall(".//table")
+    candidates = [t for t in tables
+                  if "単勝" in " ".join(t.itertext())] or tables
     for t in candidates:
-        for tr in t.find_all("tr"):
-            cells = [td.get_text(" ", strip=True) for td in tr.find_all(["td", "th"])]
-            if not cells or len(cells) < 2:
-                continue
+        for tr in t.iter("tr"):
+            yield ["".join(td.itertext()).strip() for td in tr.iter("td", "th")]
+
+
+def _classify_cells(cells: List[str]) -> Tuple[Optional[int], Optional[float]]:
+    """1行ぶんのセルから (馬番, 単勝) を1パスで分類。両方見つかれば打ち切り。
+    型が安定した小さなループに切り出してある（インタプリタのフレームも軽くなる）。"""
+    umaban: Optional[int] = None
+    odds: Optional[float] = None
+    for i, c in enumerate(cells):
+        if umaban is not None and odds is not None:
+            break
+        if not _is_num(c):
+            continue
+        if umaban is None and i < 2 and "." not in c and len(c) <= 2:
+            umaban = int(c)
+        if odds is None:
+            v = float(c)
+            if 1.0 <= v <= 999.9:
+                odds = v
+    return umaban, odds
+
 
-            # 馬番候補
-            umaban: Optional[int] = None
-            for c in cells[:2]:
-                m = re.fullmatch(r"\d{1,2}", c)
-                if m:
-                    umaban = int(m.group(0))
-                    break
-
-            # 単勝候補（妥当レンジ）
-            odds: Optional[float] = None
-            for c in cells:
-                if re.fullmatch(r"\d+(\.\d+)?", c):
-                    v = float(c)
-                    if 1.0 <= v <= 999.9:
-                        odds = v
-                        break
-
-            if umaban is not None and odds is not None:
-                found[umaban] = odds
+def parse_tanfuku_table(html: str) -> List[HorseOdds]:
+    found: Dict[int, float] = {}
+    for cells in _iter_candidate_rows(html):
+        if not cells or len(cells) < 2:
+            continue
+        umaban, odds = _classify_cells(cells)
+        if umaban is not None and odds is not None:
+            found[umaban] = odds
 
     if not found:
         return []
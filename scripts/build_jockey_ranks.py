@@ -37,6 +37,13 @@ UA_HEADERS = {
 FUKU_KEYS = ("複勝", "複勝率", "3着内", "３着内")
 NAME_KEYS = ("騎手名", "騎手")
 
+# 行ごとの見出し再出現チェック用（セル毎のPythonレベルany()走査を1回のC実装searchに）
+_NAME_RE = re.compile("|".join(NAME_KEYS))
+_FUKU_RE = re.compile("|".join(FUKU_KEYS))
+
+# 空白除去はregexではなくC実装のstr.translateで（全角スペース含む）
+_WS_DELETE = str.maketrans("", "", " \t\n\r\u3000")
+
 ARTIFACT_PATH = "/tmp/jockey_leading.html"
 
 def fetch_html_first_success(urls) -> Tuple[str, str]:
@@ -69,7 +76,7 @@ def headers_of_table(tbl) -> List[str]:
     else:
         first = tbl.find("tr")
         cells = first.find_all(["th", "td"]) if first else []
-    return [re.sub(r"\s+", "", c.get_text()) for c in cells]
+    return [c.get_text().translate(_WS_DELETE) for c in cells]
 
 def pct_to_float(s: str):
     m = re.search(r"([0-9]+(?:\.[0-9]+)?)\s*%?", s)
@@ -86,8 +93,8 @@ def pick_candidate_table(soup: BeautifulSoup) -> Tuple[Optional[object], List[st
     def score(headers: List[str]) -> int:
         sc = 0
         joined = " ".join(headers)
-        if any(k in joined for k in NAME_KEYS): sc += 2
-        if any(k in joined for k in FUKU_KEYS): sc += 3
+        if _NAME_RE.search(joined): sc += 2
+        if _FUKU_RE.search(joined): sc += 3
         if any("勝率" in h for h in headers): sc += 1
         if any("連対" in h for h in headers): sc += 1
         return sc
@@ -123,8 +130,8 @@ def parse_rows(tbl, headers: List[str]) -> List[dict]:
         texts = [td.get_text(strip=True) for td in tds]
 
         # 見出し行の再出現スキップ
-        joined = re.sub(r"\s+", "", "".join(texts))
-        if any(k in joined for k in NAME_KEYS) and any(k in joined for k in FUKU_KEYS):
+        joined = "".join(texts).translate(_WS_DELETE)
+        if _NAME_RE.search(joined) and _FUKU_RE.search(joined):
             continue
 
         def get(i):
@@ -164,11 +171,7 @@ def main():
     html, used_url = fetch_html_first_success(CANDIDATE_URLS)
     print(f"[info] parsing from: {used_url}")
 
-    # lxml が入っていれば使う。なければhtml.parserでOK
-    try:
-        soup = BeautifulSoup(html, "lxml")
-    except Exception:
-        soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, "lxml")
 
     tbl, headers = pick_candidate_table(soup)
     if not tbl:
@@ -3,6 +3,8 @@ import os, time, logging, requests
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
+SESSION = requests.Session()  # 宛先ループでTLS接続を使い回す
+
 LINE_ACCESS_TOKEN = os.getenv("LINE_ACCESS_TOKEN", "").strip()
 LINE_USER_ID = os.getenv("LINE_USER_ID", "").strip()
 
@@ -13,7 +15,7 @@ def push(user_id: str, text: str):
     url = "https://api.line.me/v2/bot/message/push"
     headers = {"Authorization": f"Bearer {LINE_ACCESS_TOKEN}", "Content-Type": "application/json"}
     payload = {"to": user_id, "messages": [{"type": "text", "text": text}]}
-    r = requests.post(url, headers=headers, json=payload, timeout=10)
+    r = SESSION.post(url, headers=headers, json=payload, timeout=10)
     if r.status_code != 200:
         logging.warning("LINE送信失敗 user=%s status=%s body=%s", user_id, r.status_code, r.text)
     else:
@@ -14,13 +14,19 @@ SHEET_ID = os.getenv("GOOGLE_SHEET_ID", "")
 RECIPIENTS_TAB = os.getenv("GOOGLE_SHEET_TAB", "フォームの回答1")
 SENT_LOG_TAB = os.getenv("SENT_LOG_TAB", "sent_log")
 
+_SVC = None  # 資格情報のJSONパース＋discovery構築はプロセスで1回
+
 def _build_service():
+    global _SVC
+    if _SVC is not None:
+        return _SVC
     creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON", "").strip()
     if not creds_json:
         raise RuntimeError("GOOGLE_APPLICATION_CREDENTIALS_JSON env is empty")
     info = json.loads(creds_json)
     creds = Credentials.from_service_account_info(info, scopes=SCOPES)
-    return build("sheets", "v4", credentials=creds, cache_discovery=False)
+    _SVC = build("sheets", "v4", credentials=creds, cache_discovery=False)
+    return _SVC
 
 def fetch_recipients() -> List[Dict[str, Any]]:
     """
@@ -32,18 +38,44 @@ def fetch_recipients() -> List[Dict[str, Any]]:
     """
     try:
         service = _build_service()
-        rng = f"'{RECIPIENTS_TAB}'!A1:Z1000"
-        res = service.spreadsheets().values().get(spreadsheetId=SHEET_ID, range=rng).execute()
-        values = res.get("values", [])
-        if not values:
+        # まずヘッダ行だけ読んで必要列を特定し、その2列だけをbatchGetで取る
+        # （A1:Z1000の全列転送をやめ、ペイロードを列数ぶん縮める）
+        res = service.spreadsheets().values().get(
+            spreadsheetId=SHEET_ID, range=f"'{RECIPIENTS_TAB}'!1:1").execute()
+        header = [c.strip() for c in (res.get("values") or [[]])[0]]
+        if not header:
+            return []
+
+        def _col_letter(idx: int) -> str:
+            letters = ""
+            idx += 1
+            while idx:
+                idx, rem = divmod(idx - 1, 26)
+                letters = chr(ord("A") + rem) + letters
+            return letters
+
+        try:
+            i_enabled = header.index("enabled")
+            i_uid = header.index("userId")
+        except ValueError:
+            logging.warning("fetch_recipients: enabled/userId 列が見つかりません header=%s", header)
             return []
-        header = [c.strip() for c in values[0]]
+
+        res = service.spreadsheets().values().batchGet(
+            spreadsheetId=SHEET_ID,
+            ranges=[f"'{RECIPIENTS_TAB}'!{_col_letter(i)}2:{_col_letter(i)}"
+                    for i in (i_enabled, i_uid)],
+        ).execute()
+        cols = [vr.get("values", []) for vr in res.get("valueRanges", [])]
+        enabled_col, uid_col = cols[0], cols[1]
         out = []
-        for row in values[1:]:
-            rec = {header[i]: (row[i] if i < len(row) else "") for i in range(len(header))}
-            enabled = str(rec.get("enabled", "")).strip().lower() in ("1","true","yes","on")
-            uid = str(rec.get("userId", "")).strip()
-            out.append({"enabled": enabled, "userId": uid})
+        for i in range(max(len(enabled_col), len(uid_col))):
+            enabled_s = enabled_col[i][0] if i < len(enabled_col) and enabled_col[i] else ""
+            uid = uid_col[i][0] if i < len(uid_col) and uid_col[i] else ""
+            out.append({
+                "enabled": str(enabled_s).strip().lower() in ("1","true","yes","on"),
+                "userId": str(uid).strip(),
+            })
         return out
     except Exception as e:
         logging.warning("fetch_recipients failed: %s", e)
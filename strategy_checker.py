@@ -1,3 +1,5 @@
+import numpy as np
+
 
 def match_strategies(race):
     o = race['odds']
@@ -10,3 +12,33 @@ def match_strategies(race):
     if o[1] <= 3.0 and o[2] <= 3.0 and 6.0 <= o[3] <= 10.0 and o[4] >= 15.0:
         return '④'
     return None
+
+
+def match_strategies_batch(races):
+    """
+    複数レースをまとめて判定するベクトル版。
+    戻り値は races と同順の '①'〜'④' / None のリスト（判定は match_strategies と同じ）。
+    欠けている人気のオッズは NaN 扱い＝その条件は不成立。
+    """
+    if not races:
+        return []
+    width = max(4, max(max(r['odds']) for r in races))
+    odds = np.full((len(races), width), np.nan)
+    for i, r in enumerate(races):
+        for pop, v in r['odds'].items():
+            odds[i, pop - 1] = v
+    o1, o2, o3, o4 = odds[:, 0], odds[:, 1], odds[:, 2], odds[:, 3]
+    tail = odds[:, 1:]
+    with np.errstate(invalid='ignore'):
+        m1 = (o1 >= 2.0) & (o1 < 10.0) & (o2 < 10.0) & (o3 < 10.0) & (o4 >= 15.0)
+        m2 = (o1 < 2.0) & (o2 < 10.0) & (o3 < 10.0)
+        m3 = (o1 <= 1.5) & ((tail >= 10.0) & (tail <= 20.0)).any(axis=1)
+        m4 = (o1 <= 3.0) & (o2 <= 3.0) & (o3 >= 6.0) & (o3 <= 10.0) & (o4 >= 15.0)
+    out = []
+    for i in range(len(races)):
+        if m1[i]:   out.append('①')
+        elif m2[i]: out.append('②')
+        elif m3[i]: out.append('③')
+        elif m4[i]: out.append('④')
+        else:       out.append(None)
+    return out
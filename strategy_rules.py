@@ -62,6 +62,15 @@ def _odds_map(horses: List[Dict]) -> Dict[int, float]:
             m[p] = o
     return m
 
+def _horse_by_pop(horses: List[Dict]) -> Dict[int, Dict]:
+    """人気→馬レコード（1始まり）。線形スキャンの代わりに1回で索引を作る。"""
+    m: Dict[int, Dict] = {}
+    for h in horses:
+        p = _safe_int(h.get("pop"))
+        if p is not None and p not in m:
+            m[p] = h
+    return m
+
 def _fmt(o: Optional[float]) -> str:
     return "—" if o is None else f"{o:.1f}"
 
@@ -113,6 +122,7 @@ def eval_strategy(horses: List[Dict], logger=None) -> Optional[Dict]:
     を返す。合致しなければ {"match": False, "why": "..."} を返す。
     """
     o = _odds_map(horses)
+    by_pop = _horse_by_pop(horses)
     o1, o2, o3, o4 = o.get(1), o.get(2), o.get(3), o.get(4)
 
     # --- デバッグ（崩れにくい1行ログ） ---
@@ -155,13 +165,12 @@ def eval_strategy(horses: List[Dict], logger=None) -> Optional[Dict]:
                 pass
         if len(candidates3) >= S3_CAND_MIN_COUNT:
             cond3 = True
-            # 軸（1番人気）の馬番
+            # 軸（1番人気）の馬番（索引から直接引く）
             axis_umaban = None
-            for h in horses:
-                if _safe_int(h.get("pop")) == 1:
-                    num = h.get("num")
-                    axis_umaban = num if isinstance(num, int) else _safe_int(num)
-                    break
+            axis = by_pop.get(1)
+            if axis is not None:
+                num = axis.get("num")
+                axis_umaban = num if isinstance(num, int) else _safe_int(num)
             # 馬番で買い目生成（足りなければ人気フォールバック）
             cand_umanums = [c.get("umaban") for c in candidates3 if c.get("umaban") is not None]
             tickets3 = _tickets_perm_with_axis_num(axis_umaban, cand_umanums)
@@ -11,7 +11,7 @@ def fetch_tanfuku(raceid: str):
     url = f"https://keiba.rakuten.co.jp/odds/tanfuku/RACEID/{raceid}"
     r = requests.get(url, headers={"User-Agent": UA, "Accept-Language":"ja"}, timeout=25)
     r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = BeautifulSoup(r.text, "lxml")
 
     rows = []
     # まずは生テキストで全<tr>をざっと見る（構造掴むフェーズ）
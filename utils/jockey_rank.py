@@ -3,12 +3,15 @@
 
 import csv
 import os
+import pickle
 import unicodedata
 from functools import lru_cache
 from typing import Dict, Optional, Tuple
 
 DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "jockey_ranks.csv")
+PICKLE_PATH = os.path.splitext(DATA_PATH)[0] + ".pkl"
 
+@lru_cache(maxsize=4096)
 def _normalize_name(name: str) -> str:
     """全角/半角・空白・敬称などをならして突き合わせ精度を上げる"""
     if not name:
@@ -31,6 +34,14 @@ def _load_table() -> Dict[str, Tuple[int, str, str]]:
     if not os.path.exists(DATA_PATH):
         raise FileNotFoundError(f"CSV not found: {DATA_PATH}")
 
+    # CSVより新しいpickleがあればそれを読む（プロセス再起動のたびの再パースを省く）
+    try:
+        if os.path.exists(PICKLE_PATH) and os.path.getmtime(PICKLE_PATH) >= os.path.getmtime(DATA_PATH):
+            with open(PICKLE_PATH, "rb") as f:
+                return pickle.load(f)
+    except Exception:
+        pass  # 壊れていたらCSVから作り直す
+
     with open(DATA_PATH, encoding="utf-8") as f:
         reader = csv.DictReader(f)
         # 期待するカラム名:
@@ -46,8 +57,17 @@ def _load_table() -> Dict[str, Tuple[int, str, str]]:
             belong = str(row["Belong"]).strip()
             key = _normalize_name(name)
             table[key] = (rank, belong, name)
+
+    # 次回起動用にpickleを書き出しておく（失敗しても動作には影響なし）
+    if table:
+        try:
+            with open(PICKLE_PATH, "wb") as f:
+                pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            pass
     return table
 
+@lru_cache(maxsize=4096)
 def get_rank_letter(jockey_name: str) -> Optional[str]:
     """
     騎手名から 'A' | 'B' | 'C' を返す。
@@ -8,31 +8,80 @@ from typing import List, Dict, Any, Optional
 from urllib.parse import urljoin
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
+from lxml import html as lhtml
+
+try:
+    from selectolax.lexbor import LexborHTMLParser  # あれば見出し系の抽出を軽量DOMで
+except ImportError:
+    LexborHTMLParser = None
 
 JST = timezone(timedelta(hours=9))
 
+# 接続を使い回す共有セッション（RACEIDごとのTLSハンドシェイクを省く）
+SESSION = requests.Session()
+SESSION.headers.update({
+    "User-Agent": "Mozilla/5.0 (Linux; rv:109.0) Gecko/20100101 Firefox/117.0"
+})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16, pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.7,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"])),
+))
+
 # ===== Rakuten URL =====
 BASE = "https://keiba.rakuten.co.jp/"
 ODDS_TANFUKU = "odds/tanfuku/RACEID/{race_id}"
 
+# 正規表現の高速パス（DOM構築を省く）。構造が合わない場合はBeautifulSoupへフォールバック
+RE_ODDS_ROW = re.compile(
+    r'<td[^>]*class="number"[^>]*>\s*(\d+)\s*</td>'      # 馬番
+    r'(?:(?!</tr>).)*?'                                   # 同一<tr>内に限定
+    r'<td[^>]*class="oddsWin"[^>]*>\s*<span[^>]*>\s*([\d.,]+)\s*</span>',
+    re.S,
+)
+RE_POP_IN_ROW = re.compile(r'class="rank"[^>]*>[^<]*?(\d+)\s*番人気')
+RE_TANFUKU_LINK = re.compile(r"/odds/tanfuku/RACEID/(\d{17,18})")
+
 # ===== 共通 =====
+# 同一URLの再取得をTTL付きで抑止（fetch_tanfuku_odds と get_race_start_iso が
+# 同じページを引く・リトライ/再実行で同一RACEIDを引き直す、を1回のGETに圧縮）
+_PAGE_CACHE: Dict[str, Any] = {}
+_PAGE_CACHE_TTL_SEC = 45.0
+
 def _get(url: str, *, timeout: int = 15) -> Optional[str]:
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Linux; rv:109.0) Gecko/20100101 Firefox/117.0"
-    }
-    for i in range(2):
-        try:
-            r = requests.get(url, headers=headers, timeout=timeout)
-            if r.status_code == 200 and r.text:
-                return r.text
-            logging.warning("GET失敗 status=%s url=%s", r.status_code, url)
-        except Exception as e:
-            logging.warning("GET例外(%s/%s): %s", i + 1, 2, e)
-            time.sleep(0.7)
+    ent = _PAGE_CACHE.get(url)
+    if ent and ent[0] > time.time():
+        return ent[1]
+    try:
+        r = SESSION.get(url, timeout=timeout)  # リトライ/バックオフはアダプタ側で実施
+        if r.status_code == 200 and r.text:
+            _PAGE_CACHE[url] = (time.time() + _PAGE_CACHE_TTL_SEC, r.text)
+            return r.text
+        logging.warning("GET失敗 status=%s url=%s", r.status_code, url)
+    except Exception as e:
+        logging.warning("GET例外: %s", e)
     return None
 
 
+# URL→構築済みsoupのメモ（同一ページをh1/発走時刻/人気補完で何度もパースしない）
+_SOUP_CACHE: Dict[str, Any] = {}
+
+def _get_soup(url: str) -> Optional[BeautifulSoup]:
+    ent = _SOUP_CACHE.get(url)
+    if ent and ent[0] > time.time():
+        return ent[1]
+    html = _get(url)
+    if not html:
+        return None
+    soup = BeautifulSoup(html, "lxml")
+    _SOUP_CACHE[url] = (time.time() + _PAGE_CACHE_TTL_SEC, soup)
+    return soup
+
+
 def _text(el) -> str:
     return (el.get_text(strip=True) if el else "").strip()
 
@@ -44,22 +93,10 @@ def _to_float(s: str, default: float = 9999.0) -> float:
         return default
 
 
-def _parse_date_hm_on_page(soup: BeautifulSoup) -> Optional[str]:
-    """
-    ページ上の日付と発走時刻 → ISO（JST）に。
-    例: 「2025年8月10日」「発走時刻 16:45」
-    """
-    # 日付
-    date_span = soup.select_one("#headline .dateSelect .selectedDay")
-    date_txt = _text(date_span)
-    # 発走時刻
-    note_dl = soup.select_one(".raceNote .trackMainState")
-    hm = None
-    if note_dl:
-        m = re.search(r"発走時刻\s*([0-2]?\d:[0-5]\d)", _text(note_dl))
-        if m:
-            hm = m.group(1)
-
+def _compose_start_iso(date_txt: str, note_txt: str) -> Optional[str]:
+    """「2025年8月10日」「発走時刻 16:45」の2テキスト → ISO（JST）。"""
+    m = re.search(r"発走時刻\s*([0-2]?\d:[0-5]\d)", note_txt)
+    hm = m.group(1) if m else None
     if date_txt and hm:
         m = re.search(r"(\d{4})年\s*(\d{1,2})月\s*(\d{1,2})日", date_txt)
         if m:
@@ -70,6 +107,34 @@ def _parse_date_hm_on_page(soup: BeautifulSoup) -> Optional[str]:
     return None
 
 
+def _parse_date_hm_on_page(soup: BeautifulSoup) -> Optional[str]:
+    """
+    ページ上の日付と発走時刻 → ISO（JST）に。
+    例: 「2025年8月10日」「発走時刻 16:45」
+    """
+    return _compose_start_iso(
+        _text(soup.select_one("#headline .dateSelect .selectedDay")),
+        _text(soup.select_one(".raceNote .trackMainState")),
+    )
+
+
+def _extract_header_meta(html: str, url: str):
+    """h1テキストと発走ISOを返す。selectolaxがあればフルのsoup構築を省く。"""
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(html)
+        def _t(sel: str) -> str:
+            node = tree.css_first(sel)
+            return node.text(strip=True) if node else ""
+        h1 = _t("#headline h1.unique")
+        start_iso = _compose_start_iso(_t("#headline .dateSelect .selectedDay"),
+                                       _t(".raceNote .trackMainState"))
+        return h1, start_iso
+    soup = _get_soup(url)
+    if soup is None:
+        return "", None
+    return _text(soup.select_one("#headline h1.unique")), _parse_date_hm_on_page(soup)
+
+
 # ====== 公開API（main.py が参照） ======
 
 def list_today_raceids() -> List[str]:
@@ -94,14 +159,11 @@ def list_today_raceids() -> List[str]:
         html = _get(url)
         if not html:
             return
-        soup = BeautifulSoup(html, "lxml")
-        for a in soup.select(".raceNumber a[href*='/odds/tanfuku/RACEID/']"):
-            href = a.get("href") or ""
-            m = re.search(r"/odds/tanfuku/RACEID/(\d{17,18})", href)
-            if m:
-                rid = m.group(1)
-                if rid not in found:
-                    found.append(rid)
+        # DOMを組まず生HTMLをfinditerで1パス（レース帯のリンクは全てこのパターン）
+        for m in RE_TANFUKU_LINK.finditer(html):
+            rid = m.group(1)
+            if rid not in found:
+                found.append(rid)
 
     for s in seeds:
         collect_from_list_page(s)
@@ -112,13 +174,10 @@ def list_today_raceids() -> List[str]:
         url = urljoin(BASE, ODDS_TANFUKU.format(race_id="202508101006060407"))
         html = _get(url)
         if html:
-            soup = BeautifulSoup(html, "lxml")
-            for a in soup.select(".raceNumber a[href*='/odds/tanfuku/RACEID/']"):
-                m = re.search(r"/odds/tanfuku/RACEID/(\d{17,18})", a.get("href") or "")
-                if m:
-                    rid = m.group(1)
-                    if rid not in found:
-                        found.append(rid)
+            for m in RE_TANFUKU_LINK.finditer(html):
+                rid = m.group(1)
+                if rid not in found:
+                    found.append(rid)
 
     if found:
         logging.info("Rakutenスクレイピングで本日検出: %d 件", len(found))
@@ -143,45 +202,47 @@ def fetch_tanfuku_odds(race_id: str) -> Optional[Dict[str, Any]]:
         logging.warning("HTML取得に失敗 race_id=%s", race_id)
         return None
 
-    soup = BeautifulSoup(html, "lxml")
-
     # 会場・R
     # 例: <h1 class="unique">盛岡競馬場 7R オッズ</h1>
-    h1 = _text(soup.select_one("#headline h1.unique"))
+    h1, start_iso = _extract_header_meta(html, url)
     m = re.search(r"(.+?)競馬場\s+(\d+)R", h1)
     venue = (m.group(1) if m else "").strip() or "地方"
     race_no = (m.group(2) if m else "").strip() + "R"
 
-    # 発走（ISO）
-    start_iso = _parse_date_hm_on_page(soup)
-
-    # 本体テーブル（枠・馬番順）— 非表示でもHTML上は存在する
-    rows = soup.select("#oddsField #wakuUmaBanJun table tbody tr")
-    if not rows:
-        # ページ表示直後に「人気順」タブしか載らないケースへの保険
-        rows = soup.select("#oddsField table.dataTable tbody.selectWrap tr")
-
+    # 高速パス：生HTMLを1パス走査（行が4件未満ならレイアウト変化とみなしDOM走査へ）
     horses: List[Dict[str, Any]] = []
-    for tr in rows:
-        umaban = _text(tr.select_one("td.number"))
-        odds_s = _text(tr.select_one("td.oddsWin span"))
-        pop_s = _text(tr.select_one("td.rank"))
-
-        if not umaban or not odds_s:
-            # 稀に馬体重行や装飾行が紛れることがあるのでスキップ
-            continue
-
-        # 人気は「8番人気」→ 8
-        pop = None
-        m2 = re.search(r"(\d+)\s*番人気", pop_s)
-        if m2:
-            pop = int(m2.group(1))
-
+    for m_row in RE_ODDS_ROW.finditer(html):
+        row_html = m_row.group(0)
+        m_pop = RE_POP_IN_ROW.search(row_html)
         horses.append({
-            "umaban": int(umaban),
-            "odds": _to_float(odds_s),
-            "pop": (pop if pop is not None else 999),
+            "umaban": int(m_row.group(1)),
+            "odds": _to_float(m_row.group(2)),
+            "pop": (int(m_pop.group(1)) if m_pop else 999),
         })
+    if len(horses) < 4:
+        horses = []
+        # 馬番セルを持つ行だけをXPathでC側に絞り込ませる（馬体重行や装飾行は最初から来ない）
+        tree = lhtml.fromstring(html)
+        rows = tree.xpath('//*[@id="oddsField"]//tr[td[contains(@class,"number")]]')
+        for tr in rows:
+            umaban = tr.xpath('string(td[contains(@class,"number")])').strip()
+            odds_s = tr.xpath('string(td[contains(@class,"oddsWin")]//span)').strip()
+            pop_s  = tr.xpath('string(td[contains(@class,"rank")])').strip()
+
+            if not umaban.isdigit() or not odds_s:
+                continue
+
+            # 人気は「8番人気」→ 8
+            pop = None
+            m2 = re.search(r"(\d+)\s*番人気", pop_s)
+            if m2:
+                pop = int(m2.group(1))
+
+            horses.append({
+                "umaban": int(umaban),
+                "odds": _to_float(odds_s),
+                "pop": (pop if pop is not None else 999),
+            })
 
     if not horses:
         logging.warning("単勝テーブル抽出に失敗（空）  race_id=%s", race_id)
@@ -189,14 +250,24 @@ def fetch_tanfuku_odds(race_id: str) -> Optional[Dict[str, Any]]:
 
     # 人気がテーブルに無い場合、人気順ブロックから補完
     if any(h["pop"] == 999 for h in horses):
-        rank_rows = soup.select("#ninkiKohaitoJun .rank table tbody tr")
         # rank_rows: 「順位 / 馬番 / 馬名 / 単勝 / 複勝」
         pop_by_umaban: Dict[int, int] = {}
-        for rr in rank_rows:
-            num = _text(rr.select_one("th.number"))
-            pos = _text(rr.select_one("td.position"))
-            if num.isdigit() and pos.isdigit():
-                pop_by_umaban[int(num)] = int(pos)
+        if LexborHTMLParser is not None:
+            tree = LexborHTMLParser(html)
+            for rr in tree.css("#ninkiKohaitoJun .rank table tbody tr"):
+                num_n = rr.css_first("th.number")
+                pos_n = rr.css_first("td.position")
+                num = num_n.text(strip=True) if num_n else ""
+                pos = pos_n.text(strip=True) if pos_n else ""
+                if num.isdigit() and pos.isdigit():
+                    pop_by_umaban[int(num)] = int(pos)
+        else:
+            soup = _get_soup(url)
+            for rr in (soup.select("#ninkiKohaitoJun .rank table tbody tr") if soup else []):
+                num = _text(rr.select_one("th.number"))
+                pos = _text(rr.select_one("td.position"))
+                if num.isdigit() and pos.isdigit():
+                    pop_by_umaban[int(num)] = int(pos)
         if pop_by_umaban:
             for h in horses:
                 if h["pop"] == 999 and h["umaban"] in pop_by_umaban:
@@ -215,11 +286,10 @@ def fetch_tanfuku_odds(race_id: str) -> Optional[Dict[str, Any]]:
 
 def get_race_start_iso(race_id: str) -> Optional[str]:
     """
-    発走時刻のISO（JST）を再取得（fetch_tanfuku_odds と同一ページから）。
+    発走時刻のISO（JST）を再取得（fetch_tanfuku_odds と同一ページ・同一ツリーを再利用）。
     """
     url = urljoin(BASE, ODDS_TANFUKU.format(race_id=race_id))
-    html = _get(url)
-    if not html:
+    soup = _get_soup(url)
+    if soup is None:
         return None
-    soup = BeautifulSoup(html, "lxml")
     return _parse_date_hm_on_page(soup)
\ No newline at end of file
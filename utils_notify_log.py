@@ -11,14 +11,20 @@ CRED_JSON = os.getenv("GOOGLE_CREDENTIALS_JSON", "")
 TAB_NAME = os.getenv("NOTIFY_LOG_SHEET_TAB", "notify_log")
 _HEADER = ["date_jst", "race_id", "strategy", "stake", "bets_json", "notified_at", "jockey_ranks"]
 
+_SVC = None  # 資格情報のJSONパース＋discovery構築はプロセスで1回
+
 def _sheet_service():
+    global _SVC
+    if _SVC is not None:
+        return _SVC
     if not SHEET_ID or not CRED_JSON:
         raise RuntimeError("notify_log: 環境変数不足")
     info = json.loads(CRED_JSON)
     creds = Credentials.from_service_account_info(
         info, scopes=["https://www.googleapis.com/auth/spreadsheets"]
     )
-    return build("sheets", "v4", credentials=creds, cache_discovery=False)
+    _SVC = build("sheets", "v4", credentials=creds, cache_discovery=False)
+    return _SVC
 
 def _resolve_sheet_title(svc, title: str) -> str:
     meta = svc.spreadsheets().get(spreadsheetId=SHEET_ID).execute()
@@ -44,7 +50,7 @@ def append_notify_log(payload: Dict) -> None:
     try:
         svc = _sheet_service()
     except Exception as e:
-        logging.warning(f"[notify_log] Sheets初期化失敗: {e}")
+        logging.warning("[notify_log] Sheets初期化失敗: %s", e)
         return
     title = _resolve_sheet_title(svc, TAB_NAME)
     values = _get_values(svc, title, "A:G")
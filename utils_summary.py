@@ -1,4 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+日次サマリ用ユーティリティ（daily.py から使用）
+- JST時刻ヘルパ
+- 結果ページの並行取得（httpx HTTP/2 + asyncio.gather / 同時20接続まで）
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+import pandas as pd
+from bs4 import BeautifulSoup
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
 
 JST = timezone(timedelta(hours=9))
 
@@ -6,4 +27,249 @@ def jst_now() -> str:
     return datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
 
 def jst_today_str() -> str:
-    return datetime.now(JST).strftime("%Y%m%d")
\ No newline at end of file
+    return datetime.now(JST).strftime("%Y%m%d")
+
+def jst_yesterday_str() -> str:
+    return (datetime.now(JST) - timedelta(days=1)).strftime("%Y%m%d")
+
+# ===== 日次ロック =====
+def try_acquire_daily_lock(day_str: str) -> bool:
+    """
+    /tmp/daily_lock_YYYYMMDD を O_CREAT|O_EXCL で原子的に作成。
+    既に存在すれば False（同日の再送防止）。exists()+open() の
+    TOCTOUを避けるためsyscall1回で判定する。
+    """
+    path = f"/tmp/daily_lock_{day_str}"
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    try:
+        os.write(fd, str(int(time.time())).encode())
+    finally:
+        os.close(fd)
+    return True
+
+# ===== Google Sheets（notify_log / ユーザ一覧） =====
+GOOGLE_CREDENTIALS_JSON = os.getenv("GOOGLE_CREDENTIALS_JSON", "")
+GOOGLE_SHEET_ID      = os.getenv("GOOGLE_SHEET_ID", "")
+SHEET_NOTIFY_LOG_TAB = os.getenv("SHEET_NOTIFY_LOG_TAB", "notify_log")
+USERS_SHEET_NAME     = os.getenv("USERS_SHEET_NAME", "1")
+USERS_USERID_COL     = os.getenv("USERS_USERID_COL", "H")
+
+SHEET_CACHE_TTL_SEC = 300  # 同一プロセス内の再読込を抑える
+
+_SHEET_SVC = None  # 資格情報パース＋discovery構築はプロセスで1回（TTL失効ごとに再構築しない）
+
+def _sheet_service():
+    global _SHEET_SVC
+    if _SHEET_SVC is not None:
+        return _SHEET_SVC
+    if not GOOGLE_CREDENTIALS_JSON or not GOOGLE_SHEET_ID:
+        raise RuntimeError("Google Sheets 環境変数不足")
+    info  = json.loads(GOOGLE_CREDENTIALS_JSON)
+    creds = Credentials.from_service_account_info(info, scopes=["https://www.googleapis.com/auth/spreadsheets"])
+    _SHEET_SVC = build("sheets", "v4", credentials=creds, cache_discovery=False)
+    return _SHEET_SVC
+
+# notify_log とユーザ列を1回の batchGet で取り、TTL内はメモリから返す
+_SHEET_CACHE: Dict[str, object] = {"ts": 0.0, "ranges": None}
+
+def _load_sheet_ranges() -> List[List[List[str]]]:
+    now = time.time()
+    if _SHEET_CACHE["ranges"] is not None and now - float(_SHEET_CACHE["ts"]) < SHEET_CACHE_TTL_SEC:
+        return _SHEET_CACHE["ranges"]  # type: ignore[return-value]
+    svc = _sheet_service()
+    res = svc.spreadsheets().values().batchGet(
+        spreadsheetId=GOOGLE_SHEET_ID,
+        ranges=[
+            f"'{SHEET_NOTIFY_LOG_TAB}'!A:L",
+            f"'{USERS_SHEET_NAME}'!{USERS_USERID_COL}2:{USERS_USERID_COL}",
+        ],
+    ).execute()
+    ranges = [vr.get("values", []) for vr in res.get("valueRanges", [])]
+    _SHEET_CACHE["ranges"] = ranges
+    _SHEET_CACHE["ts"] = now
+    return ranges
+
+def _looks_like_line_user_id(s: str) -> bool:
+    return s.startswith("U") and len(s) == 33
+
+def read_notify_logs_for_day(day_ymd: str) -> List[Dict[str, str]]:
+    """notify_log タブから date == day_ymd の行をヘッダ名キーのdictで返す。"""
+    try:
+        values = _load_sheet_ranges()[0]
+    except Exception as e:
+        logging.warning("[SHEET] notify_log 読込失敗: %s", e)
+        return []
+    if not values or "date" not in values[0]:
+        return []
+    header = [str(c).strip() for c in values[0]]
+    width = len(header)
+    # 日付フィルタと列名付けはC実装のpandasに任せる（行数が増えても線形のPythonループを踏まない）
+    df = pd.DataFrame(((row + [""] * (width - len(row)))[:width] for row in values[1:]),
+                      columns=header)
+    return df[df["date"].str.strip() == day_ymd].to_dict("records")
+
+# ユーザ一覧は人手編集でしか変わらないので、notify_logより長いTTLで持つ
+USERS_TTL_SEC = int(os.getenv("USERS_TTL_SEC", "600"))
+_USERS_CACHE: Dict[str, object] = {"ts": 0.0, "data": None}
+
+def load_user_ids() -> List[str]:
+    """ユーザシートの userId 列から配信先を返す（10分TTLキャッシュ）。"""
+    if _USERS_CACHE["data"] is not None and time.time() - float(_USERS_CACHE["ts"]) < USERS_TTL_SEC:
+        return _USERS_CACHE["data"]  # type: ignore[return-value]
+    try:
+        rows = _load_sheet_ranges()[1]
+    except Exception as e:
+        logging.warning("[SHEET] users 読込失敗: %s", e)
+        return []
+    # dict.fromkeysで順序保持のままO(N)重複排除（リストのin検索はN^2になる）
+    out = list(dict.fromkeys(
+        uid for row in rows
+        if _looks_like_line_user_id(uid := (str(row[0]).strip() if row else ""))
+    ))
+    _USERS_CACHE["data"] = out
+    _USERS_CACHE["ts"] = time.time()
+    return out
+
+# ===== 結果取得（並行版） =====
+RESULT_URL = "https://keiba.rakuten.co.jp/race_card/race_result/RACEID/{rid}"
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Accept-Language": "ja,en-US;q=0.9",
+}
+_FIN_HEAD_RE = re.compile(r"(着順|順位)")
+_SMALL_NUM_RE = re.compile(r"\b(\d{1,2})\b")
+MAX_CONCURRENCY = 20  # Rakutenへの同時リクエスト上限（HTTP/2で1コネクションに多重化）
+
+def _parse_finish123(html: str) -> Optional[str]:
+    """結果ページから上位3頭の馬番 '1-2-3' を抽出。未確定なら None。"""
+    soup = BeautifulSoup(html, "lxml")
+    finish: List[int] = []
+    for head in soup.select("table > thead"):
+        table = head.parent
+        if not _FIN_HEAD_RE.search(" ".join(head.stripped_strings)):
+            continue
+        body = table.find("tbody") or table
+        for tr in body.find_all("tr")[:3]:
+            row_txt = " ".join(tr.stripped_strings)
+            for m in _SMALL_NUM_RE.finditer(row_txt):
+                if 1 <= int(m.group(1)) <= 18:
+                    finish.append(int(m.group(1)))
+                    break
+        if len(finish) >= 3:
+            return f"{finish[0]}-{finish[1]}-{finish[2]}"
+    return None
+
+async def _fetch_result_or_none(client: httpx.AsyncClient,
+                                sem: asyncio.Semaphore,
+                                race_id: str) -> Optional[Dict]:
+    """1レース分の結果を取得。未確定・失敗は None。"""
+    url = RESULT_URL.format(rid=race_id)
+    try:
+        async with sem:
+            resp = await client.get(url)
+            resp.raise_for_status()
+            html = resp.text
+    except Exception as e:
+        logging.warning("[RESULT] fetch fail rid=%s: %s", race_id, e)
+        return None
+    fin = _parse_finish123(html)
+    if not fin:
+        return None
+    return {"finish123": fin, "result_url": url, "settled": True}
+
+async def _poll_one(client: httpx.AsyncClient, sem: asyncio.Semaphore,
+                    row: Dict, deadline: float) -> Dict:
+    """1レースを確定まで個別バックオフでポーリング。遅いレースが他を塞がない。"""
+    backoff = 5.0
+    while True:
+        res = await _fetch_result_or_none(client, sem, row.get("race_id", ""))
+        if res and res.get("settled"):
+            return {**row, **res}
+        if time.time() + backoff >= deadline:
+            return {**row, "settled": False}
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+async def _fetch_results_async(rows: List[Dict], max_wait_sec: int) -> List[Dict]:
+    deadline = time.time() + max_wait_sec
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    async with httpx.AsyncClient(
+        http2=True, headers=FETCH_HEADERS, timeout=25,
+        limits=httpx.Limits(max_keepalive_connections=10, max_connections=MAX_CONCURRENCY),
+    ) as client:
+        results = await asyncio.gather(
+            *[_poll_one(client, sem, r, deadline) for r in rows],
+            return_exceptions=True,
+        )
+    # 例外で落ちた行も欠測のまま返す（サマリ側で「結果待ち」表示）
+    out: List[Dict] = []
+    for r, res in zip(rows, results):
+        out.append(res if isinstance(res, dict) else {**r, "settled": False})
+    return out
+
+def fetch_results_with_retry(rows: List[Dict], max_wait_sec: int = 180) -> List[Dict]:
+    """
+    notify_log 由来の行（race_id 必須）にレース結果を突合して返す。
+    全レースを asyncio.gather で並行取得し、未確定分のみ再試行する。
+    """
+    if not rows:
+        return []
+    return asyncio.run(_fetch_results_async(rows, max_wait_sec))
+
+# ===== 日次サマリ本文 =====
+MESSAGE_MAX_LEN = 4900  # LINE上限5000の安全マージン
+
+@dataclass(slots=True)
+class _StratAgg:
+    races: int = 0    # 通知件数
+    settled: int = 0  # 結果確定数
+
+def build_summary_report_messages(rows: List[Dict], day_ymd: str,
+                                  compact: bool = False) -> List[str]:
+    """
+    結果突合済みの行から配信メッセージ（本文のリスト）を組み立てる。
+    - compact=True: 結果が確定した行だけの軽量版（補完用）。確定ゼロなら []。
+    """
+    if compact:
+        rows = [r for r in rows if r.get("settled")]
+        if not rows:
+            return []
+
+    by_strategy: Dict[str, _StratAgg] = defaultdict(_StratAgg)
+    lines: List[str] = [f"【日次サマリ {day_ymd[:4]}/{day_ymd[4:6]}/{day_ymd[6:8]}】"]
+    for r in rows:
+        sid = str(r.get("strategy_id") or r.get("strategy") or "-")
+        agg = by_strategy[sid]
+        agg.races += 1
+        if r.get("settled"):
+            agg.settled += 1
+            result = f"結果 {r.get('finish123', '-')}"
+        else:
+            result = "結果待ち"
+        venue = str(r.get("venue") or "").strip()
+        race_no = str(r.get("race_no") or "").strip()
+        lines.append(f"・{venue}{race_no} [{sid}] {result}")
+
+    lines.append("")
+    for sid in sorted(by_strategy):
+        agg = by_strategy[sid]
+        lines.append(f"{sid}: 通知{agg.races}件 / 確定{agg.settled}件")
+    lines.append("")
+    lines.append("※馬券の的中を保証するものではありません。余裕資金の範囲内で馬券購入をお願いします。")
+
+    # LINEの文字数上限でメッセージ分割
+    messages: List[str] = []
+    buf = ""
+    for ln in lines:
+        if buf and len(buf) + 1 + len(ln) > MESSAGE_MAX_LEN:
+            messages.append(buf)
+            buf = ln
+        else:
+            buf = f"{buf}\n{ln}" if buf else ln
+    if buf:
+        messages.append(buf)
+    return messages
@@ -11,13 +11,24 @@ Rakuten競馬 監視・通知バッチ（近いレース優先処理版 v2025-09
 - ★ 近いレース（|target-now| が小さい順）を **優先処理**（取りこぼし低減）
 """
 
-import os, re, json, time, random, logging, socket
+import os, re, json, time, logging, socket
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple, Any
 
+import numpy as np
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import html as lhtml
+
+try:
+    import orjson  # あれば使う（ETagキャッシュは本文込みでMB級になり得る）
+except ImportError:
+    orjson = None
+from bs4 import BeautifulSoup, SoupStrainer
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 
@@ -34,8 +45,17 @@ SESSION.headers.update({
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                   "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
     "Accept-Language": "ja,en-US;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",  # brはbrotliパッケージがあれば自動伸長
 })
-TIMEOUT = (10, 25); RETRY = 3; SLEEP_BETWEEN = (0.6, 1.2)
+# 並行フェッチ（FETCH_WORKERS）がコネクションを奪い合わないようプールを広げて常時keep-alive。
+# リトライはurllib3のRetryに任せる（ソケットをプールに保ったままバックオフできる）
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10, pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.7,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"])),
+))
+TIMEOUT = (10, 25)
 
 LINE_PUSH_URL = "https://api.line.me/v2/bot/message/push"
 
@@ -68,33 +88,104 @@ DAILY_SUMMARY_HHMM = os.getenv("DAILY_SUMMARY_HHMM", "21:02")
 ALWAYS_NOTIFY_DAILY_SUMMARY = os.getenv("ALWAYS_NOTIFY_DAILY_SUMMARY", "1") == "1"
 
 UNIT_STAKE_YEN = int(os.getenv("UNIT_STAKE_YEN", "100"))
+FETCH_WORKERS  = int(os.getenv("FETCH_WORKERS", "8"))   # 発走時刻の並行取得数
 DEBUG_RACEIDS  = [s.strip() for s in os.getenv("DEBUG_RACEIDS","").split(",") if s.strip()]
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
 # ===== fetchユーティリティ =====
-def fetch(url: str) -> str:
-    last = None
-    for _ in range(RETRY):
-        try:
-            r = SESSION.get(url, timeout=TIMEOUT)
-            r.raise_for_status()
-            r.encoding = "utf-8"
-            return r.text
-        except Exception as e:
-            last = e
-            time.sleep(random.uniform(*SLEEP_BETWEEN))
-    raise last
+# 条件付きGET用キャッシュ（url -> {etag, last_modified, body}）
+# listページは日中ほぼ不変なので 304 応答で本文転送とパースを省く
+ETAG_CACHE_PATH = Path("/tmp/etag_cache.json")
+
+def _load_etag_cache() -> Dict[str, Dict[str, str]]:
+    try:
+        if ETAG_CACHE_PATH.exists():
+            data = ETAG_CACHE_PATH.read_bytes()
+            return orjson.loads(data) if orjson else json.loads(data)
+    except Exception:
+        pass
+    return {}
+
+_ETAG_CACHE = _load_etag_cache()
+_ETAG_DIRTY = False  # ジョブ末尾で1回だけ書く（更新のたびの全書き直しと、スレッドからの競合書込を回避）
+
+# 同一URLの短時間の再取得をプロセス内で抑止（1回のジョブ中、開催一覧などは何度も引かれる）。
+# オッズ等の生モノは15秒、listページ（use_cache対象）は実質不変なので60秒持たせる
+PAGE_CACHE_TTL_SEC = 15.0
+LIST_PAGE_CACHE_TTL_SEC = 60.0
+_PAGE_CACHE: Dict[str, Tuple[float, str]] = {}
+
+def _save_etag_cache() -> None:
+    global _ETAG_DIRTY
+    if not _ETAG_DIRTY:
+        return
+    try:
+        tmp = ETAG_CACHE_PATH.with_suffix(".tmp")
+        if orjson:
+            tmp.write_bytes(orjson.dumps(_ETAG_CACHE))
+        else:
+            tmp.write_text(json.dumps(_ETAG_CACHE, ensure_ascii=False, separators=(",", ":")))
+        os.replace(tmp, ETAG_CACHE_PATH)  # 途中killでも壊れたファイルを残さない
+        _ETAG_DIRTY = False
+    except Exception as e:
+        logging.warning("[CACHE] etag保存失敗: %s", e)
+
+def fetch(url: str, use_cache: bool = False) -> str:
+    ent = _PAGE_CACHE.get(url)
+    if ent and ent[0] > time.time():
+        return ent[1]
+    headers = {}
+    cond = _ETAG_CACHE.get(url) if use_cache else None
+    if cond:
+        if cond.get("etag"):          headers["If-None-Match"]     = cond["etag"]
+        if cond.get("last_modified"): headers["If-Modified-Since"] = cond["last_modified"]
+    r = SESSION.get(url, timeout=TIMEOUT, headers=headers or None)
+    ttl = LIST_PAGE_CACHE_TTL_SEC if use_cache else PAGE_CACHE_TTL_SEC
+    if use_cache and r.status_code == 304:
+        body = _ETAG_CACHE.get(url, {}).get("body", "")
+        _PAGE_CACHE[url] = (time.time() + ttl, body)
+        return body
+    r.raise_for_status()
+    # Response.text はアクセスのたびにバイト列をデコードし直すので、1回で実体化して使い回す
+    text = r.content.decode("utf-8", errors="replace")
+    if use_cache and (r.headers.get("ETag") or r.headers.get("Last-Modified")):
+        _ETAG_CACHE[url] = {
+            "etag": r.headers.get("ETag", ""),
+            "last_modified": r.headers.get("Last-Modified", ""),
+            "body": text,
+        }
+        global _ETAG_DIRTY
+        _ETAG_DIRTY = True
+    _PAGE_CACHE[url] = (time.time() + ttl, text)
+    return text
 
 # ===== Google Sheets 基本処理 =====
+# serviceとタブ名解決はプロセス内で固定なので1回だけ作る
+# （毎回の資格情報パース＋discovery構築＋メタデータGETを省く）
+_SHEET_SVC = None
+_TITLE_CACHE: Dict[str, str] = {}
+
 def _sheet_service():
+    global _SHEET_SVC
+    if _SHEET_SVC is not None:
+        return _SHEET_SVC
     if not GOOGLE_CREDENTIALS_JSON or not GOOGLE_SHEET_ID:
         raise RuntimeError("Google Sheets 環境変数不足")
     info  = json.loads(GOOGLE_CREDENTIALS_JSON)
     creds = Credentials.from_service_account_info(info, scopes=["https://www.googleapis.com/auth/spreadsheets"])
-    return build("sheets","v4",credentials=creds, cache_discovery=False)
+    _SHEET_SVC = build("sheets","v4",credentials=creds, cache_discovery=False)
+    return _SHEET_SVC
 
 def _resolve_sheet_title(svc, tab_or_gid: str) -> str:
+    cached = _TITLE_CACHE.get(tab_or_gid)
+    if cached is not None:
+        return cached
+    title = _resolve_sheet_title_uncached(svc, tab_or_gid)
+    _TITLE_CACHE[tab_or_gid] = title
+    return title
+
+def _resolve_sheet_title_uncached(svc, tab_or_gid: str) -> str:
     meta = svc.spreadsheets().get(spreadsheetId=GOOGLE_SHEET_ID).execute()
     sheets = meta.get("sheets", [])
     if tab_or_gid.isdigit() and len(tab_or_gid)>3:
@@ -122,32 +213,72 @@ def _sheet_put(svc, title: str, a1: str, values: List[List[str]]):
     ).execute()
 
 # ===== TTL（再送抑止） =====
+# notifiedはこのプロセス自身しか書かないので、短TTLのローカルキャッシュで読みを省く
+NOTIFIED_CACHE_TTL = int(os.getenv("NOTIFIED_CACHE_TTL", "60"))
+_NOTIFIED_CACHE: Dict[str, Any] = {"ts": 0.0, "data": None}
+_HEADER_KEYS = frozenset({"KEY", "RACEID", "RID", "ID"})
+
 def sheet_load_notified() -> Dict[str,float]:
+    if _NOTIFIED_CACHE["data"] is not None and time.time() - _NOTIFIED_CACHE["ts"] < NOTIFIED_CACHE_TTL:
+        return _NOTIFIED_CACHE["data"]
     svc = _sheet_service(); title = _resolve_sheet_title(svc, GOOGLE_SHEET_TAB)
     values = _sheet_get(svc, title, "A:C")
-    start = 1 if values and values[0] and str(values[0][0]).upper() in ("KEY","RACEID","RID","ID") else 0
+    start = 1 if values and values[0] and str(values[0][0]).upper() in _HEADER_KEYS else 0
     out: Dict[str,float] = {}
     for row in values[start:]:
         if not row or len(row)<2: continue
         key=str(row[0]).strip()
         try: out[key]=float(row[1])
         except: pass
+    _NOTIFIED_CACHE["data"] = out
+    _NOTIFIED_CACHE["ts"] = time.time()
     return out
 
+# 同一サイクル内のTTL書き込みはバッファし、サイクル末尾の flush_notified() で
+# 1回のキー列読み＋batchUpdate/appendにまとめる（複数レース発火時の書込クォータ対策）
+_PENDING_UPSERTS: List[Tuple[str, float, str]] = []
+
 def sheet_upsert_notified(key: str, ts: float, note: str="") -> None:
-    svc = _sheet_service(); title = _resolve_sheet_title(svc, GOOGLE_SHEET_TAB)
-    values = _sheet_get(svc, title, "A:C")
-    header = ["KEY","TS_EPOCH","NOTE"]
-    if not values:
-        _sheet_put(svc, title, "A:C", [header, [key, ts, note]]); return
-    start_row = 1 if values and values[0] and values[0][0] in header else 0
-    found = None
-    for i,row in enumerate(values[start_row:], start=start_row):
-        if row and str(row[0]).strip()==key:
-            found = i; break
-    if found is None: values.append([key, ts, note])
-    else:             values[found]=[key, ts, note]
-    _sheet_put(svc, title, "A:C", values)
+    _PENDING_UPSERTS.append((key, ts, note))
+    if _NOTIFIED_CACHE["data"] is not None:
+        _NOTIFIED_CACHE["data"][key] = ts  # ローカルには即反映（次ティックの再読込を不要に）
+
+def flush_notified() -> None:
+    if not _PENDING_UPSERTS:
+        return
+    # 同一キーは最後の書き込みが勝つ
+    merged: Dict[str, Tuple[float, str]] = {}
+    for key, ts, note in _PENDING_UPSERTS:
+        merged[key] = (ts, note)
+    try:
+        svc = _sheet_service(); title = _resolve_sheet_title(svc, GOOGLE_SHEET_TAB)
+        keys = _sheet_get(svc, title, "A:A")
+        if not keys:
+            _sheet_put(svc, title, "A1:C1", [["KEY","TS_EPOCH","NOTE"]])
+            keys = [["KEY"]]
+        index = {str(row[0]).strip(): i for i, row in enumerate(keys, start=1) if row}
+        updates = []
+        new_rows = []
+        for key, (ts, note) in merged.items():
+            row = index.get(key)
+            if row:
+                updates.append({"range": f"'{title}'!A{row}:C{row}", "values": [[key, ts, note]]})
+            else:
+                new_rows.append([key, ts, note])
+        if updates:
+            svc.spreadsheets().values().batchUpdate(
+                spreadsheetId=GOOGLE_SHEET_ID,
+                body={"valueInputOption": "RAW", "data": updates}
+            ).execute()
+        if new_rows:
+            svc.spreadsheets().values().append(
+                spreadsheetId=GOOGLE_SHEET_ID, range=f"'{title}'!A:C",
+                valueInputOption="RAW", insertDataOption="INSERT_ROWS",
+                body={"values": new_rows}
+            ).execute()
+        _PENDING_UPSERTS.clear()
+    except Exception as e:
+        logging.warning("[SHEET] notified flush失敗: %s", e)
 
 # ===== notify_log / bets =====
 def _notify_log_header():
@@ -181,50 +312,144 @@ def sheet_append_bet_record(date_ymd:str, race_id:str, venue:str, race_no:str,
     
 # ===== RID列挙（当日/翌日） =====
 RACEID_RE   = re.compile(r"/RACEID/(\d{18})")
-PLACEHOLDER = re.compile(r"\d{8}0000000000$")
+_PLACEHOLDER_TAIL = "0000000000"  # 18桁IDの末尾10桁が0＝開催一覧などのプレースホルダ
 
-def _extract_rids_from_html(html: str) -> list[str]:
+def _extract_rids_from_html(html: str) -> set[str]:
+    # 欲しいのは18桁IDだけなのでDOMを組まず生HTMLをfinditerで1パス。
+    # プレースホルダ判定は正規表現ではなくスライス比較（1回のmemcmp）で済ませる。
+    # 呼び出し側が和集合を取って最後に1回だけソートするので、ここではsetのまま返す
     rids=set()
-    soup=BeautifulSoup(html, "lxml")
-    for a in soup.find_all("a", href=True):
-        m=RACEID_RE.search(a["href"])
-        if m:
-            rid=m.group(1)
-            if not PLACEHOLDER.search(rid): rids.add(rid)
-    return sorted(rids)
+    for m in RACEID_RE.finditer(html):
+        rid=m.group(1)
+        if rid[-10:] != _PLACEHOLDER_TAIL: rids.add(rid)
+    return rids
+
+# 開催一覧HTMLはRID列挙時に一度取るので、近傍フォールバックで再取得せず使い回す
+_DAYLIST_HTML: Dict[str, str] = {}
+
+# ===== 発走時刻の永続キャッシュ =====
+# 発走時刻は日中ほぼ動かないので、一度取れたRIDは再フェッチしない。
+# 取れなかったRID（空文字で記録）も短TTLでネガティブキャッシュする。
+POSTTIME_CACHE_PATH = Path("/tmp/posttimes.json")
+POSTTIME_NEG_TTL_SEC = int(os.getenv("POSTTIME_NEG_TTL_SEC", "300"))
+
+def _load_posttime_cache() -> Dict[str, Dict[str, Any]]:
+    try:
+        if POSTTIME_CACHE_PATH.exists():
+            raw = POSTTIME_CACHE_PATH.read_bytes()
+            return orjson.loads(raw) if orjson else json.loads(raw)
+    except Exception:
+        pass
+    return {}
+
+_POSTTIME_CACHE = _load_posttime_cache()
+_POSTTIME_DIRTY = False
+
+def _save_posttime_cache() -> None:
+    global _POSTTIME_DIRTY
+    if not _POSTTIME_DIRTY:
+        return
+    try:
+        tmp = POSTTIME_CACHE_PATH.with_suffix(".tmp")
+        if orjson:
+            tmp.write_bytes(orjson.dumps(_POSTTIME_CACHE))
+        else:
+            tmp.write_text(json.dumps(_POSTTIME_CACHE, separators=(",", ":")))
+        os.replace(tmp, POSTTIME_CACHE_PATH)
+        _POSTTIME_DIRTY = False
+    except Exception as e:
+        logging.warning("[CACHE] 発走時刻保存失敗: %s", e)
+
+def _posttime_cache_get(rid: str) -> Optional[str]:
+    """ヒットなら 'HH:MM'（取得済み）か ''（直近失敗）を返す。ミスは None。"""
+    ent = _POSTTIME_CACHE.get(rid)
+    if not ent:
+        return None
+    hhmm = ent.get("hhmm", "")
+    if not hhmm and time.time() - float(ent.get("ts", 0)) > POSTTIME_NEG_TTL_SEC:
+        return None
+    return hhmm
+
+def _posttime_cache_put(rid: str, hhmm: str) -> None:
+    global _POSTTIME_DIRTY
+    _POSTTIME_CACHE[rid] = {"hhmm": hhmm, "ts": time.time()}
+    _POSTTIME_DIRTY = True
 
 def list_raceids_today_and_next() -> list[str]:
     today = jst_today()
     y,m,d = int(today[:4]), int(today[4:6]), int(today[6:8])
     t0 = datetime(y,m,d,tzinfo=JST)
     next_ymd = (t0 + timedelta(days=1)).strftime("%Y%m%d")
-    rids=[]
-    for ymd in (today, next_ymd):
+    rids: set = set()
+    def _fetch_day(ymd: str):
         url = f"https://keiba.rakuten.co.jp/race_card/list/RACEID/{ymd}0000000000"
         try:
-            html = fetch(url)
+            html = fetch(url, use_cache=True)
+            _DAYLIST_HTML[ymd] = html
             logging.info("[GET] %s http=200 bytes=%s", url, len(html))
-            rids += _extract_rids_from_html(html)
+            return _extract_rids_from_html(html)
         except Exception as e:
             logging.warning("[WARN] RID一覧取得失敗: %s (%s)", e, url)
-    rids = sorted(set(rids))
+            return set()
+    # 当日と翌日は独立したページなので同時に取る
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        for part in ex.map(_fetch_day, (today, next_ymd)):
+            rids |= part
+    rids = sorted(rids)
     logging.info("[RIDS] today+next=%d", len(rids))
     return rids
 
 # ===== 発走時刻抽出（list専用 + 開催一覧近傍フォールバック） =====
-def _extract_start_hhmm_from_html(html: str) -> Optional[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    txt = soup.get_text(" ", strip=True)
-    m = re.search(r'(?:発走|発走予定|発走時刻)\s*([0-2]?\d)\s*[:：]\s*([0-5]\d)', txt)
-    if m: return f"{int(m.group(1)):02d}:{int(m.group(2)):02d}"
-    m = re.search(r'([0-2]?\d)\s*時\s*([0-5]\d)\s*分.*?(?:発走|発走予定|発走時刻)', txt)
-    if m: return f"{int(m.group(1)):02d}:{int(m.group(2)):02d}"
-    m = re.search(r'([0-2]?\d)\s*[:：]\s*([0-5]\d)', txt)
-    if m: return f"{int(m.group(1)):02d}:{int(m.group(2)):02d}"
+# 時刻系の正規表現はRIDごとに繰り返し使うのでモジュールスコープで1回だけコンパイル。
+# ラベル付き/○時○分/素のHH:MM を1本のオルタネーションに融合し、テキストを1パスで走査する
+_TIME_SCAN_RE = re.compile(
+    r'(?:発走|発走予定|発走時刻|予定)\s*(?P<lh>[0-2]?\d)\s*[:：]\s*(?P<lm>[0-5]\d)'
+    r'|(?P<jh>[0-2]?\d)\s*時\s*(?P<jm>[0-5]\d)\s*分'
+    r'|(?P<ph>[0-2]?\d)\s*[:：]\s*(?P<pm>[0-5]\d)'
+)
+_START_WORD_RE = re.compile(r'発走|発走予定|発走時刻')
+_HHMM_RE       = re.compile(r'([0-2]?\d)\s*[:：]\s*([0-5]\d)')
+_FLOAT_CELL_RE = re.compile(r"\d+\.\d+")
+_INT_RE        = re.compile(r"\d+")
+_RACE_NO_RE    = re.compile(r"\b(\d{1,2})R\b")
+
+def _scan_hhmm(txt: str, jifun_needs_label: bool = False) -> Optional[str]:
+    """優先度: ラベル付き > ○時○分 > 素のHH:MM。finditer1回で全候補を拾う。"""
+    first_jf = first_plain = None
+    for m in _TIME_SCAN_RE.finditer(txt):
+        if m.group('lh') is not None:
+            return f"{int(m.group('lh')):02d}:{int(m.group('lm')):02d}"
+        if m.group('jh') is not None:
+            if first_jf is None: first_jf = m
+        elif first_plain is None:
+            first_plain = m
+    if first_jf is not None and (not jifun_needs_label or _START_WORD_RE.search(txt, first_jf.end())):
+        return f"{int(first_jf.group('jh')):02d}:{int(first_jf.group('jm')):02d}"
+    if first_plain is not None:
+        return f"{int(first_plain.group('ph')):02d}:{int(first_plain.group('pm')):02d}"
     return None
 
+def _extract_start_hhmm_from_html(html: str) -> Optional[str]:
+    # テキスト化しか要らないのでBS4ラッパを介さずlxmlで直接flatten
+    txt = lhtml.fromstring(html).text_content()
+    # listページの「○時○分」表記は後続に発走ラベルがある場合のみ採用（従来挙動）
+    return _scan_hhmm(txt, jifun_needs_label=True)
+
+# 開催一覧は1枚のHTMLを多数のRIDで引き直すため、構築済みツリーをHTML単位でメモ化する
+_DAYLIST_SOUP_CACHE: Dict[int, Any] = {}
+
+def _daylist_soup(html: str) -> BeautifulSoup:
+    key = hash(html)
+    soup = _DAYLIST_SOUP_CACHE.get(key)
+    if soup is None:
+        soup = BeautifulSoup(html, "lxml")
+        if len(_DAYLIST_SOUP_CACHE) >= 4:  # 当日+翌日で2枚、余裕を見て4枚まで
+            _DAYLIST_SOUP_CACHE.clear()
+        _DAYLIST_SOUP_CACHE[key] = soup
+    return soup
+
 def _extract_start_hhmm_near_rid_from_daylist(html: str, rid: str) -> Optional[str]:
-    soup = BeautifulSoup(html, "lxml")
+    soup = _daylist_soup(html)
     a = soup.find("a", href=re.compile(re.escape(rid)))
     if not a: return None
     ancestors = []
@@ -239,20 +464,20 @@ def _extract_start_hhmm_near_rid_from_daylist(html: str, rid: str) -> Optional[s
             for attr in ("datetime","data-time","title","aria-label"):
                 v=t.get(attr)
                 if v:
-                    m = re.search(r'([0-2]?\d)[:：]([0-5]\d)', str(v))
+                    m = _HHMM_RE.search(str(v))
                     if m: return f"{int(m.group(1)):02d}:{int(m.group(2)):02d}"
             txt_t = t.get_text(" ", strip=True)
-            m = re.search(r'([0-2]?\d)[:：]([0-5]\d)', txt_t)
+            m = _HHMM_RE.search(txt_t)
             if m: return f"{int(m.group(1)):02d}:{int(m.group(2)):02d}"
         txt = el.get_text(" ", strip=True)
-        for pat in [r'(?:発走|予定)\s*([0-2]?\d)[:：]([0-5]\d)',
-                    r'([0-2]?\d)\s*時\s*([0-5]\d)\s*分',
-                    r'([0-2]?\d)[:：]([0-5]\d)']:
-            m = re.search(pat, txt)
-            if m: return f"{int(m.group(1)):02d}:{int(m.group(2)):02d}"
-        return None
+        return _scan_hhmm(txt)
 
     for host in ancestors:
+        # 外側の祖先ほどテキストが入れ子で重複する。ページ規模のブロックまで膨らんだら
+        # 打ち切り、全文の重複スキャン（O(祖先数×ページ長)）を避ける
+        txt_len = len(host.get_text(" ", strip=True)) if hasattr(host, "get_text") else 0
+        if txt_len > 4000:
+            break
         hhmm = _scan(host)
         if hhmm: return hhmm
 
@@ -267,68 +492,126 @@ def _extract_start_hhmm_near_rid_from_daylist(html: str, rid: str) -> Optional[s
             if hhmm: return hhmm
     return None
 
+@lru_cache(maxsize=4096)
+def _rid_date_parts(rid: str) -> Tuple[int, int, int]:
+    """RID先頭8桁 → (年, 月, 日)。同一RIDで何度もintスライスしない。"""
+    return int(rid[:4]), int(rid[4:6]), int(rid[6:8])
+
 def get_start_time_dt(rid: str) -> Optional[datetime]:
-    # A) 直接 list ページ
+    # 0) 永続キャッシュ（発走時刻は確定後ほぼ動かない）
+    cached = _posttime_cache_get(rid)
+    if cached is not None:
+        if not cached:
+            return None  # ネガティブキャッシュTTL内
+        y,m,d = _rid_date_parts(rid)
+        return datetime(y,m,d,int(cached[:2]),int(cached[3:]), tzinfo=JST)
+
+    ymd = rid[:8]
+
+    # A) RID列挙で取得済みの開催一覧から先に引く（HTTP不要・ツリーはメモ化済み）。
+    #    ここでほぼ全RIDが埋まり、レース個別のlistページfetchは取りこぼし分だけになる
+    day_html = _DAYLIST_HTML.get(ymd)
+    if day_html:
+        try:
+            hhmm = _extract_start_hhmm_near_rid_from_daylist(day_html, rid)
+            if hhmm:
+                _posttime_cache_put(rid, hhmm)
+                y,m,d = _rid_date_parts(rid)
+                return datetime(y,m,d,int(hhmm[:2]),int(hhmm[3:]), tzinfo=JST)
+        except Exception as e:
+            logging.warning("[WARN] daylist近傍抽出失敗 rid=%s err=%s", rid, e)
+
+    # B) 直接 list ページ
     url_list = f"https://keiba.rakuten.co.jp/race_card/list/RACEID/{rid}"
     try:
         html = fetch(url_list)
         hhmm = _extract_start_hhmm_from_html(html)
         if hhmm:
-            y,m,d = int(rid[:4]), int(rid[4:6]), int(rid[6:8])
+            _posttime_cache_put(rid, hhmm)
+            y,m,d = _rid_date_parts(rid)
             return datetime(y,m,d,int(hhmm[:2]),int(hhmm[3:]), tzinfo=JST)
     except Exception as e:
         logging.warning("[WARN] list抽出失敗 rid=%s err=%s", rid, e)
 
-    # B) 開催一覧（RID近傍）
-    ymd = rid[:8]
-    url_day = f"https://keiba.rakuten.co.jp/race_card/list/RACEID/{ymd}0000000000"
-    try:
-        day_html = fetch(url_day)
-        hhmm2 = _extract_start_hhmm_near_rid_from_daylist(day_html, rid)
-        if hhmm2:
-            y,m,d = int(ymd[:4]), int(ymd[4:6]), int(ymd[6:8])
-            return datetime(y,m,d,int(hhmm2[:2]),int(hhmm2[3:]), tzinfo=JST)
-    except Exception as e:
-        logging.warning("[WARN] daylist近傍抽出失敗 rid=%s err=%s", rid, e)
+    # C) 開催一覧が未取得だった場合（ENV/DEBUG由来のRID）は取得して近傍抽出
+    if not day_html:
+        url_day = f"https://keiba.rakuten.co.jp/race_card/list/RACEID/{ymd}0000000000"
+        try:
+            day_html = fetch(url_day, use_cache=True)
+            hhmm2 = _extract_start_hhmm_near_rid_from_daylist(day_html, rid)
+            if hhmm2:
+                _posttime_cache_put(rid, hhmm2)
+                y,m,d = _rid_date_parts(rid)
+                return datetime(y,m,d,int(hhmm2[:2]),int(hhmm2[3:]), tzinfo=JST)
+        except Exception as e:
+            logging.warning("[WARN] daylist近傍抽出失敗 rid=%s err=%s", rid, e)
 
+    _posttime_cache_put(rid, "")  # 短TTLのネガティブキャッシュ
     return None
     
 # ===== オッズ（単勝）抽出：自動推論パーサ =====
+_NUM_RE = re.compile(r"\d+(?:\.\d+)?")  # ホットパス用（セルごとの再コンパイル/キャッシュ参照を回避）
+
 def _as_float(text:str)->Optional[float]:
     if not text: return None
     t=text.replace(",", " ").strip()
-    m=re.search(r"\d+(?:\.\d+)?", t)
+    m=_NUM_RE.search(t)
     return float(m.group(0)) if m else None
 
+def _header_col_indexes(table) -> Optional[Dict[str, int]]:
+    """ヘッダ行に列名が明示されていれば {名前→index} を引いて即決する。
+    （推論スキャンは列名の無い表のためのフォールバックに回す）"""
+    head = table.find("thead") or table.find("tr")
+    if not head:
+        return None
+    hmap = {}
+    for i, c in enumerate(head.find_all(["th","td"])):
+        hmap.setdefault(c.get_text(" ", strip=True), i)
+    pop_idx = hmap.get("人気")
+    if pop_idx is None:
+        pop_idx = hmap.get("順位")
+    win_idx = hmap.get("単勝")
+    if win_idx is None:
+        win_idx = next((i for h, i in hmap.items()
+                        if "単勝" in h and "率" not in h and "%" not in h), None)
+    if pop_idx is None or win_idx is None:
+        return None
+    num_idx = hmap.get("馬番")
+    return {"pop": pop_idx, "win": win_idx, "num": num_idx if num_idx is not None else -1}
+
 def _find_popular_odds_table(soup:BeautifulSoup):
+    """オッズ表らしきtableを探し、(全行のセルテキスト, 列index) を返す。
+    セルテキストはここで1回だけ抽出し、スコアリングとパースの両方で使い回す
+    （従来は推奨列の走査とパースでDOMを3回なめ直していた）。"""
     for table in soup.find_all("table"):
-        rows = table.find_all("tr")
-        if len(rows) < 2: 
-            continue
         body = table.find("tbody") or table
-        cand_rows = [tr for tr in body.find_all("tr") if tr.find_all(["td","th"])]
-        cand_rows = cand_rows[:8]
-        if len(cand_rows) < 2:
+        rows = []
+        for tr in body.find_all("tr"):
+            tds = tr.find_all(["td","th"])
+            if tds:
+                rows.append([td.get_text(" ", strip=True) for td in tds])
+        if len(rows) < 2:
             continue
-        max_cols = max(len(r.find_all(["td","th"])) for r in cand_rows)
+        # ヘッダ名で列が確定する表は推論スキャンを丸ごとスキップ
+        idx = _header_col_indexes(table)
+        if idx is not None:
+            return rows, idx
+        cand_rows = rows[:8]
+        max_cols = max(len(r) for r in cand_rows)
         numeric_hits = [0]*max_cols
         float_hits   = [0]*max_cols
-        for r in cand_rows:
-            tds=r.find_all(["td","th"])
-            for ci in range(max_cols):
-                if ci>=len(tds): continue
-                txt = tds[ci].get_text(" ", strip=True)
+        for cells in cand_rows:
+            for ci, txt in enumerate(cells):
                 if txt.isdigit(): numeric_hits[ci]+=1
-                if re.search(r"\d+\.\d+", txt.replace(","," ")): float_hits[ci]+=1
+                if _FLOAT_CELL_RE.search(txt.replace(","," ")): float_hits[ci]+=1
 
         # 人気：連番傾向列
         pop_idx=None; best_seq=-1
         for ci in range(max_cols):
             last=0; ok=0
-            for r in cand_rows:
-                tds=r.find_all(["td","th"])
-                if ci>=len(tds): continue
-                txt=tds[ci].get_text(" ", strip=True)
+            for cells in cand_rows:
+                if ci>=len(cells): continue
+                txt=cells[ci]
                 if txt.isdigit():
                     v=int(txt)
                     if v>last: ok+=1; last=v
@@ -352,7 +635,7 @@ def _find_popular_odds_table(soup:BeautifulSoup):
 
         if pop_idx is None or win_idx is None: 
             continue
-        return table, {"pop":pop_idx, "win":win_idx, "num":num_idx if num_idx is not None else -1}
+        return rows, {"pop":pop_idx, "win":win_idx, "num":num_idx if num_idx is not None else -1}
     return None, {}
 
 def parse_odds_table(soup:BeautifulSoup)->Tuple[List[Dict[str,float]], Optional[str], Optional[str]]:
@@ -360,49 +643,69 @@ def parse_odds_table(soup:BeautifulSoup)->Tuple[List[Dict[str,float]], Optional[
     nowtime=soup.select_one(".withUpdate .nowTime") or soup.select_one(".nowTime")
     now_label=nowtime.get_text(strip=True) if nowtime else None
 
-    table, idx=_find_popular_odds_table(soup)
-    if not table: return [], venue_race, now_label
+    rows, idx=_find_popular_odds_table(soup)
+    if not rows: return [], venue_race, now_label
 
     pop_idx=idx["pop"]; win_idx=idx["win"]; num_idx=idx.get("num",-1)
-    horses=[]; body=table.find("tbody") or table
-    for tr in body.find_all("tr"):
-        tds=tr.find_all(["td","th"])
-        if len(tds)<=max(pop_idx,win_idx): continue
-        pop_txt=tds[pop_idx].get_text(" ", strip=True)
-        win_txt=tds[win_idx].get_text(" ", strip=True)
+    horses=[]
+    for cells in rows:
+        if len(cells)<=max(pop_idx,win_idx): continue
+        pop_txt=cells[pop_idx]
+        win_txt=cells[win_idx]
         if not pop_txt.isdigit(): continue
         pop=int(pop_txt)
         odds=_as_float(win_txt)
         if odds is None: continue
         rec={"pop":pop, "odds":float(odds)}
-        if 0<=num_idx<len(tds):
-            num_txt=tds[num_idx].get_text(" ", strip=True)
-            m=re.search(r"\d+", num_txt)
+        if 0<=num_idx<len(cells):
+            m=_INT_RE.search(cells[num_idx])
             if m: rec["num"]=int(m.group(0))
         horses.append(rec)
 
-    uniq={}; 
-    for h in sorted(horses, key=lambda x:x["pop"]): uniq[h["pop"]]=h
-    horses=[uniq[k] for k in sorted(uniq.keys())]
-    return horses, venue_race, now_label
+    # 人気で1回だけソートし、挿入順が人気順になるdictで重複人気を畳む（再ソート不要）
+    horses.sort(key=lambda x:x["pop"])
+    uniq={}
+    for h in horses: uniq[h["pop"]]=h
+    return list(uniq.values()), venue_race, now_label
+
+# オッズページで実際に見るのは table / h1 / 更新時刻（spanなどの小物）だけなので、
+# パース対象をそのサブツリーに限定してツリー構築コストを下げる
+TANFUKU_STRAINER = SoupStrainer(["table", "h1", "time", "span", "p", "em"])
+
+# 戦略判定に最低限必要な人気数（①②④は上位4、③は軸+相手2で3）。
+# これ未満しか取れないテーブルは評価しても不一致なので早期に見切る。
+MIN_PARSED_HORSES = 3
 
 def check_tanfuku_page(race_id: str)->Optional[Dict[str, Any]]:
     # A) tanfuku
     url1=f"https://keiba.rakuten.co.jp/odds/tanfuku/RACEID/{race_id}"
     try:
-        soup=BeautifulSoup(fetch(url1), "lxml")
-        horses, venue_race, now_label = parse_odds_table(soup)
-        if horses:
-            return {"race_id":race_id,"url":url1,"horses":horses,"venue_race":venue_race or "地方競馬","now":now_label or ""}
+        html=fetch(url1)
+        # オッズ表が無いページ（発売前/非レース）はC実装のin検索だけで見切り、ツリー構築を省く
+        if "単勝" not in html:
+            logging.info("[ODDS] オッズ表なし（パース省略） rid=%s", race_id)
+        else:
+            horses, venue_race, now_label = parse_odds_table(
+                BeautifulSoup(html, "lxml", parse_only=TANFUKU_STRAINER))
+            if len(horses) >= MIN_PARSED_HORSES:
+                return {"race_id":race_id,"url":url1,"horses":horses,"venue_race":venue_race or "地方競馬","now":now_label or ""}
+            if horses:
+                logging.info("[ODDS] 人気%d頭のみ（判定不能）rid=%s", len(horses), race_id)
     except Exception as e:
         logging.warning("[ODDS] tanfuku失敗 rid=%s err=%s", race_id, e)
     # B) win
     url2=f"https://keiba.rakuten.co.jp/odds/win/RACEID/{race_id}"
     try:
-        soup=BeautifulSoup(fetch(url2), "lxml")
-        horses, venue_race, now_label = parse_odds_table(soup)
-        if horses:
-            return {"race_id":race_id,"url":url2,"horses":horses,"venue_race":venue_race or "地方競馬","now":now_label or ""}
+        html=fetch(url2)
+        if "単勝" not in html:
+            logging.info("[ODDS] オッズ表なし（パース省略） rid=%s", race_id)
+        else:
+            horses, venue_race, now_label = parse_odds_table(
+                BeautifulSoup(html, "lxml", parse_only=TANFUKU_STRAINER))
+            if len(horses) >= MIN_PARSED_HORSES:
+                return {"race_id":race_id,"url":url2,"horses":horses,"venue_race":venue_race or "地方競馬","now":now_label or ""}
+            if horses:
+                logging.info("[ODDS] 人気%d頭のみ（判定不能）rid=%s", len(horses), race_id)
     except Exception as e:
         logging.warning("[ODDS] win失敗 rid=%s err=%s", race_id, e)
     return None
@@ -414,14 +717,23 @@ def push_line_text(user_ids: List[str], message: str)->Tuple[int,str]:
         return 200,"DRY"
     if not LINE_ACCESS_TOKEN: return 0,"NO_TOKEN"
     headers={"Authorization": f"Bearer {LINE_ACCESS_TOKEN}", "Content-Type":"application/json"}
-    ok=0; last=""
     targets = user_ids or [LINE_USER_ID]
-    for uid in targets:
+
+    def _push(uid: str) -> Tuple[int, str]:
         body={"to": uid, "messages":[{"type":"text","text": message[:5000]}]}
         r=SESSION.post(LINE_PUSH_URL, headers=headers, json=body, timeout=TIMEOUT)
-        last=f"{r.status_code} {r.text[:160]}"
-        if r.status_code==200: ok+=1
-        elif r.status_code==429: time.sleep(NOTIFY_COOLDOWN_SEC)
+        if r.status_code==429:
+            # 旧実装はここで最長30分sleepして後続ユーザー全員を道連れにしていた。
+            # ワーカー内で短く1回だけ再送する
+            time.sleep(2)
+            r=SESSION.post(LINE_PUSH_URL, headers=headers, json=body, timeout=TIMEOUT)
+        return r.status_code, f"{r.status_code} {r.text[:160]}"
+
+    ok=0; last=""
+    with ThreadPoolExecutor(max_workers=min(4, len(targets))) as ex:
+        for status, msg in ex.map(_push, targets):
+            last=msg
+            if status==200: ok+=1
     return ok, last
 
 # ===== 通知本文 =====
@@ -452,15 +764,16 @@ def build_line_notification(meta:Dict, strat:Dict, rid:str, target_dt:datetime,
 
 # ===== 通知処理（1件） =====
 def process_race(rid:str, post_dt:datetime, meta:Dict, strat:Dict, target_dt:datetime):
+    today = jst_today()  # 同一処理内で3回フォーマットしない
     ok,last = push_line_text([LINE_USER_ID] + (LINE_USER_IDS or []),
                              build_line_notification(meta, strat, rid, target_dt, "list",
                                                      meta.get("venue_race",""), meta.get("now","")))
     # notify_log
-    m=re.search(r"\b(\d{1,2})R\b", meta.get("venue_race","") or "")
+    m=_RACE_NO_RE.search(meta.get("venue_race","") or "")
     race_no = (m.group(1)+"R") if m else ""
     win_from=(target_dt-timedelta(minutes=WINDOW_BEFORE_MIN)).strftime("%H:%M:%S")
     win_to=(target_dt+timedelta(minutes=WINDOW_AFTER_MIN)).strftime("%H:%M:%S")
-    sheet_append_notify_log(jst_today(), time.time(), rid, meta.get("venue_race","").split()[0], race_no,
+    sheet_append_notify_log(today, time.time(), rid, meta.get("venue_race","").split()[0], race_no,
                             strat.get("id","Sx"), target_dt.strftime("%H:%M:%S"),
                             win_from, win_to, ok, str(last), meta.get("url",""))
     # bets（三連単固定）
@@ -470,7 +783,7 @@ def process_race(rid:str, post_dt:datetime, meta:Dict, strat:Dict, target_dt:dat
         except: return tk
         return f"{pop2num.get(a,'-')}-{pop2num.get(b,'-')}-{pop2num.get(c,'-')}"
     tickets_umaban=[_to_umaban(t) for t in (strat.get("tickets",[]) or [])]
-    sheet_append_bet_record(jst_today(), rid, meta.get("venue_race","").split()[0], race_no,
+    sheet_append_bet_record(today, rid, meta.get("venue_race","").split()[0], race_no,
                             strat.get("id","Sx"), tickets_umaban)
     # TTL
     ttl_key=f"{rid}:{target_dt.strftime('%H%M')}:{strat.get('id','Sx')}"
@@ -492,7 +805,8 @@ def main():
     try:
         p=Path("/var/data/candidates.json")
         if p.exists():
-            data=json.loads(p.read_text())
+            raw=p.read_bytes()
+            data=orjson.loads(raw) if orjson else json.loads(raw)
             cand=[str(x.get("rid")).strip() for x in data if isinstance(x,dict) and x.get("rid")]
             extra += [rid for rid in cand if rid]
             logging.info("[CAND] file=%d", len(cand))
@@ -504,15 +818,27 @@ def main():
     if extra:
         rids = sorted(set(rids + extra))
     if not rids:
+        _save_etag_cache()
+        _save_posttime_cache()
         logging.info("[INFO] RIDが0件のため終了"); return
 
     notified = sheet_load_notified()
 
+    # 通知済みRIDは発走時刻のHTTP取得前に除外（1レース=1通知なので再取得は無駄撃ち）
+    if notified and not FORCE_RUN:
+        done_rids = {k.split(":", 1)[0] for k in notified}
+        before = len(rids)
+        rids = [rid for rid in rids if rid not in done_rids]
+        if len(rids) != before:
+            logging.info("[DEDUP] 通知済みRIDを事前除外: %d -> %d", before, len(rids))
+
     # ★ target までの距離（秒）の昇順で優先度付け
     items = []
     now = jst_now()
-    for rid in rids:
-        post_dt = get_start_time_dt(rid)
+    # 発走時刻の取得はRIDごとに独立したI/Oなので並行化（直列だとRID数×RTTかかる）
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as ex:
+        post_dts = list(ex.map(get_start_time_dt, rids))
+    for rid, post_dt in zip(rids, post_dts):
         if not post_dt:
             continue
         target_dt = post_dt - timedelta(minutes=CUTOFF_OFFSET_MIN)
@@ -522,24 +848,43 @@ def main():
     items.sort(key=lambda x: x[0])
     logging.info("[PRIO] queue=%d (closest Δ=%.1fs)", len(items), items[0][0] if items else -1)
 
-    for _, rid, post_dt, target_dt in items:
-        now = jst_now()
-        lo  = target_dt - timedelta(minutes=WINDOW_BEFORE_MIN, seconds=GRACE_SECONDS)
-        hi  = target_dt + timedelta(minutes=WINDOW_AFTER_MIN,  seconds=GRACE_SECONDS)
-        ok  = (lo <= now <= hi) or FORCE_RUN
+    # 窓内＆未通知のレースを先に確定してから、オッズページを並行プリフェッチ。
+    # 窓判定そのものは全RID分をNumPyでまとめて計算（レース毎のtimedelta生成と
+    # tz-aware比較をSIMDの2比較に畳む）
+    in_window = []
+    now = jst_now()  # 窓判定は同一ティックで統一
+    now_ts = now.timestamp()
+    tgt_ts = np.array([target_dt.timestamp() for _, _, _, target_dt in items])
+    lo_ts  = tgt_ts - (WINDOW_BEFORE_MIN * 60 + GRACE_SECONDS)
+    hi_ts  = tgt_ts + (WINDOW_AFTER_MIN * 60 + GRACE_SECONDS)
+    ok_mask = ((lo_ts <= now_ts) & (now_ts <= hi_ts)) | FORCE_RUN
+    for (_, rid, post_dt, target_dt), ok, lo_t, hi_t in zip(items, ok_mask, lo_ts, hi_ts):
+        ok = bool(ok)
         logging.info("[WIND] rid=%s start=%s target=%s window=%s~%s ok=%s",
                      rid, post_dt.strftime("%H:%M"), target_dt.strftime("%H:%M"),
-                     lo.strftime("%H:%M:%S"), hi.strftime("%H:%M:%S"), ok)
+                     datetime.fromtimestamp(lo_t, JST).strftime("%H:%M:%S"),
+                     datetime.fromtimestamp(hi_t, JST).strftime("%H:%M:%S"), ok)
         if not ok:
             continue
 
         # TTL既送チェック
-        recent = [k for k in notified if k.startswith(f"{rid}:{target_dt.strftime('%H%M')}")]
+        # プレフィックスはループ外で1回だけ組み立てる（キー数ぶんのf-string再構築を回避）
+        dedup_prefix = f"{rid}:{target_dt.strftime('%H%M')}"
+        recent = [k for k in notified if k.startswith(dedup_prefix)]
         if recent and not FORCE_RUN:
             logging.info("[DEDUP] TTL内スキップ: %s", recent[0]); 
             continue
 
-        meta = check_tanfuku_page(rid)
+        in_window.append((rid, post_dt, target_dt))
+
+    metas: Dict[str, Any] = {}
+    if in_window:
+        with ThreadPoolExecutor(max_workers=min(6, len(in_window))) as ex:
+            rids_w = [rid for rid, _, _ in in_window]
+            metas = dict(zip(rids_w, ex.map(check_tanfuku_page, rids_w)))
+
+    for rid, post_dt, target_dt in in_window:
+        meta = metas.get(rid)
         if not meta:
             logging.info("[SKIP] tanfuku/win パース失敗 rid=%s", rid)
             continue
@@ -554,4 +899,7 @@ def main():
 
         process_race(rid, post_dt, meta, strat, target_dt)
 
+    flush_notified()
+    _save_etag_cache()
+    _save_posttime_cache()
     logging.info("[INFO] ジョブ終了")
\ No newline at end of file